@@ -0,0 +1,123 @@
+"""Shared setup for the benchmark scripts: a throwaway database, seeding and timing.
+
+Each script runs the app in-process through Flask's test client against a fresh
+database in a temp dir, so numbers measure the app and SQLite, not the network.
+"""
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Cheap hashes for the seeded users unless a script asks for more, and no PDF warm-up thread.
+os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+os.environ.setdefault('REPORT_WARMUP', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as ems  # noqa: E402
+
+
+@contextmanager
+def bench_database():
+    """Points the app at a freshly migrated database in a temp dir; yields a test client."""
+    work_dir = tempfile.mkdtemp(prefix='ems-bench-')
+    upload_folder = os.path.join(work_dir, 'uploads')
+    ems.DATABASE_FILE = os.path.join(work_dir, 'ems_database.db')
+    ems.UPLOAD_FOLDER = upload_folder
+    ems.THUMBNAIL_FOLDER = os.path.join(upload_folder, 'thumbs')
+    ems.app.config['UPLOAD_FOLDER'] = upload_folder
+    ems.app.config['EXPORT_FOLDER'] = os.path.join(work_dir, 'exports')
+    ems._pool = None
+    ems._dashboard_cache = (None, None)
+    ems.init_database()
+    try:
+        yield ems.app.test_client()
+    finally:
+        ems.flush_last_logins()
+        if ems._pool is not None:
+            ems._pool.close_all()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def connect():
+    return ems.configure_connection(sqlite3.connect(ems.DATABASE_FILE))
+
+
+def login(client, username='admin', password='admin123'):
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def seed_school(students, classes=1, names=None, subjects=1, photo_filename=None):
+    """Bulk-inserts students spread evenly over classes; returns (class_ids, subject_ids).
+
+    names, if given, is called with the student index and returns (name_km, name_en, name_jp).
+    """
+    conn = connect()
+    with conn:
+        teacher_id = conn.execute(
+            "INSERT INTO teachers (name, email, contact) VALUES ('Bench Teacher', 'bench@example.com', '012')").lastrowid
+        subject_ids = [conn.execute("INSERT INTO subjects (name) VALUES (?)", (f'Subject {n}',)).lastrowid
+                       for n in range(subjects)]
+        class_ids = [conn.execute("INSERT INTO classes (name, teacher_id, subject_id, academic_year) VALUES (?, ?, ?, '2025-2026')",
+                                  (f'Class {n}', teacher_id, subject_ids[0])).lastrowid for n in range(classes)]
+        rows = []
+        for n in range(students):
+            name_km, name_en, name_jp = names(n) if names else (f'សិស្ស {n}', f'Student {n}', f'生徒 {n}')
+            rows.append((name_km, name_km, name_en, name_jp, photo_filename))
+        conn.executemany("""
+            INSERT INTO students (name, name_km, name_en, name_jp, dob, contact, photo_filename)
+            VALUES (?, ?, ?, ?, '2010-01-01', '012', ?)
+        """, rows)
+        conn.execute("""
+            INSERT INTO enrollments (student_id, class_id)
+            SELECT s.id, c.id FROM students s
+            JOIN (SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS slot FROM classes) c
+                ON (s.id - 1) % ? = c.slot
+        """, (classes,))
+    conn.close()
+    return class_ids, subject_ids
+
+
+def seed_results(class_id, subject_ids, exam_type='Monthly', days=20):
+    """Grades for every enrolled student in every subject, plus a month of attendance."""
+    conn = connect()
+    with conn:
+        for subject_id in subject_ids:
+            conn.execute("""
+                INSERT INTO grades (student_id, class_id, subject_id, exam_type, score, grade_date)
+                SELECT student_id, class_id, ?, ?, (student_id * 7 + ?) % 100, '2025-01-15'
+                FROM enrollments WHERE class_id = ?
+            """, (subject_id, exam_type, subject_id, class_id))
+        for day in range(1, days + 1):
+            conn.execute("""
+                INSERT INTO attendance (student_id, class_id, attendance_date, status)
+                SELECT student_id, class_id, ?,
+                    CASE (student_id + ?) % 10 WHEN 0 THEN 'absent' WHEN 1 THEN 'late' ELSE 'present' END
+                FROM enrollments WHERE class_id = ?
+            """, (f'2025-01-{day:02d}', day, class_id))
+    conn.close()
+
+
+def measure(fn, repeat):
+    """Calls fn repeat times; returns the per-call durations in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summary(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"median {statistics.median(ordered):8.2f} ms   p95 {p95:8.2f} ms"
+
+
+def print_header(title):
+    print(f"\n=== {title} ===")
@@ -0,0 +1,59 @@
+"""Requests/sec on the list endpoints with pooled connections vs one connection per request.
+
+The per-request mode swaps get_db_connection for the original
+connect-per-call version, so the difference is the pool and its pragmas.
+
+    python benchmarks/list_endpoints.py [--students 5000] [--requests 300]
+"""
+import argparse
+import sqlite3
+import time
+
+from common import bench_database, ems, login, print_header, seed_school
+
+ENDPOINTS = (
+    '/api/students?page=1',
+    '/api/students?page=20',
+    '/api/teachers',
+    '/api/classes',
+    '/api/subjects',
+    '/api/announcements',
+)
+
+
+def connect_per_request():
+    conn = sqlite3.connect(ems.DATABASE_FILE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def requests_per_second(client, headers, path, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        assert client.get(path, headers=headers).status_code == 200
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    with bench_database() as client:
+        seed_school(args.students, classes=40)
+        headers = login(client)
+        pooled_get_db_connection = ems.get_db_connection
+
+        print_header(f"List endpoints, {args.students} students, {args.requests} requests each")
+        print(f"{'endpoint':<28}{'per-request':>14}{'pooled':>14}{'speedup':>10}")
+        for path in ENDPOINTS:
+            ems.get_db_connection = connect_per_request
+            before = requests_per_second(client, headers, path, args.requests)
+            ems.get_db_connection = pooled_get_db_connection
+            after = requests_per_second(client, headers, path, args.requests)
+            print(f"{path:<28}{before:>10.0f} r/s{after:>10.0f} r/s{after / before:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
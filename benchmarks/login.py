@@ -0,0 +1,77 @@
+"""Login throughput: per-login last_login writes vs the buffered flusher, at a few bcrypt work factors.
+
+"Per-login write" swaps record_last_login for the original UPDATE and commit on
+every successful login; "buffered" is the current batched flusher. Concurrent
+logins run on threads, standing in for a morning rush across several workers:
+bcrypt releases the GIL, so the threads overlap on hashing and contend on the
+SQLite write lock as separate processes would. Cost 4 makes bcrypt nearly free,
+leaving the rest of the login path visible.
+
+    python benchmarks/login.py [--users 200] [--rounds 4 10 12] [--concurrency 1 8]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import bench_database, connect, ems, print_header
+
+PASSWORD = 'morning-rush'
+
+
+def seed_teachers(count, password_hash):
+    conn = connect()
+    with conn:
+        conn.executemany("INSERT INTO users (username, password, email, full_name, role) VALUES (?, ?, ?, ?, 'teacher')",
+                         [(f'teacher{n}', password_hash, f'teacher{n}@example.com', f'Teacher {n}') for n in range(count)])
+    conn.close()
+
+
+def write_last_login(user_id):
+    conn = ems.get_db_connection()
+    conn.execute("UPDATE users SET last_login = ? WHERE id = ?", (ems.datetime.now(ems.timezone.utc).isoformat(), user_id))
+    conn.commit()
+
+
+def logins_per_second(users, concurrency):
+    def log_in(n):
+        response = ems.app.test_client().post('/api/login', json={'username': f'teacher{n}', 'password': PASSWORD})
+        assert response.status_code == 200, response.get_json()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(log_in, range(users)))
+    return users / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rounds', type=int, nargs='+', default=[4, 10, 12])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+
+    buffered = ems.record_last_login
+    print_header(f"POST /api/login, {args.users} distinct teachers per run")
+    print(f"{'bcrypt cost':>11}{'threads':>9}{'per-login write':>20}{'buffered':>16}")
+    with bench_database():
+        seed_teachers(args.users, '')
+        for rounds in args.rounds:
+            # Hashes already at the configured cost, so no login pays for a rehash.
+            ems.app.config['BCRYPT_LOG_ROUNDS'] = rounds
+            ems.bcrypt.init_app(ems.app)
+            password_hash = ems.bcrypt.generate_password_hash(PASSWORD).decode('utf-8')
+            conn = connect()
+            with conn:
+                conn.execute("UPDATE users SET password = ? WHERE role = 'teacher'", (password_hash,))
+            conn.close()
+            for concurrency in args.concurrency:
+                ems.record_last_login = write_last_login
+                before = logins_per_second(args.users, concurrency)
+                ems.record_last_login = buffered
+                after = logins_per_second(args.users, concurrency)
+                ems.flush_last_logins()
+                print(f"{rounds:>11}{concurrency:>9}{before:>14.1f} /s{after:>14.1f} /s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Payload bytes and response time of the big report endpoints: objects vs ?format=columnar, plain vs gzip.
+
+One class of 2,000 students with a month of attendance and grades in every
+subject. Times are whole requests, so they include the queries as well as
+building and serializing the JSON (and compressing it, in the gzip columns).
+
+    python benchmarks/payloads.py [--students 2000] [--subjects 8] [--repeat 10]
+"""
+import argparse
+
+from common import bench_database, login, measure, print_header, seed_results, seed_school, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with bench_database() as client:
+        (class_id,), subject_ids = seed_school(args.students, subjects=args.subjects)
+        seed_results(class_id, subject_ids)
+        headers = login(client)
+        endpoints = (
+            ('/api/attendance/report', {'class_id': class_id, 'month': '2025-01'}),
+            ('/api/results/class-report', {'class_id': class_id, 'exam_type': 'Monthly'}),
+            ('/api/grades/class-view', {'class_id': class_id, 'subject_id': subject_ids[0],
+                                        'exam_type': 'Monthly', 'grade_date': '2025-01-15'}),
+        )
+
+        print_header(f"{args.students}-student class, {args.subjects} subjects, {args.repeat} runs each")
+        for path, query in endpoints:
+            print(path)
+            for shape, extra in (('objects', {}), ('columnar', {'format': 'columnar'})):
+                for encoding in ('identity', 'gzip'):
+                    request_headers = {**headers, 'Accept-Encoding': encoding}
+
+                    def fetch():
+                        response = client.get(path, headers=request_headers, query_string={**query, **extra})
+                        assert response.status_code == 200
+                        return response
+
+                    size = len(fetch().data)
+                    label = f"{shape}, {encoding}"
+                    print(f"  {label:<20}{size / 1024:>9.1f} KiB   {summary(measure(fetch, args.repeat))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Peak memory of merging roster PDF chunks: pypdf PdfWriter.append vs the streaming merge_pdfs.
+
+Chunks are generated with Pillow, one photo per page, so they do not need
+WeasyPrint. Peak memory is Python-heap allocation as seen by tracemalloc,
+which is where pypdf keeps parsed objects and stream data.
+
+    python benchmarks/pdf_merge_memory.py [--chunks 10 50 100] [--pages-per-chunk 25]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from common import ems, print_header
+
+reports = ems.reports
+
+
+def make_chunks(work_dir, count, pages_per_chunk):
+    from PIL import Image, ImageFilter
+    photo = Image.effect_noise((480, 640), 64).convert('RGB').filter(ImageFilter.GaussianBlur(1))
+    pages = [photo.rotate(180 * (n % 2)) for n in range(pages_per_chunk)]
+    first = os.path.join(work_dir, '00000.pdf')
+    pages[0].save(first, save_all=True, append_images=pages[1:], resolution=150)
+    paths = [first]
+    for n in range(1, count):
+        paths.append(os.path.join(work_dir, f'{n:05d}.pdf'))
+        shutil.copyfile(first, paths[-1])
+    return paths
+
+
+def writer_append(paths, target):
+    """The previous merge: every chunk is appended to one PdfWriter, which is written at the end."""
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    writer.write(target)
+
+
+def peak_mib(merge, paths, target):
+    tracemalloc.start()
+    started = time.perf_counter()
+    merge(paths, target)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--pages-per-chunk', type=int, default=25)
+    args = parser.parse_args()
+
+    print_header(f"Merging chunks of {args.pages_per_chunk} photo pages")
+    print(f"{'chunks':>6}{'pages':>7}{'output':>10}   {'PdfWriter.append':>24}   {'merge_pdfs':>24}")
+    for count in args.chunks:
+        work_dir = tempfile.mkdtemp(prefix='ems-merge-bench-')
+        try:
+            paths = make_chunks(work_dir, count, args.pages_per_chunk)
+            target = os.path.join(work_dir, 'merged.pdf')
+            before, before_seconds = peak_mib(writer_append, paths, target)
+            after, after_seconds = peak_mib(reports.merge_pdfs, paths, target)
+            size = os.path.getsize(target) / 1024 / 1024
+            print(f"{count:>6}{count * args.pages_per_chunk:>7}{size:>7.0f} MiB"
+                  f"   {before:>8.1f} MiB peak {before_seconds:>6.2f} s"
+                  f"   {after:>8.1f} MiB peak {after_seconds:>6.2f} s")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
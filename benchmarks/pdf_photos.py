@@ -0,0 +1,87 @@
+"""Student PDF export time and size for 500 students with photos: originals vs thumbnails.
+
+Every student gets their own phone-sized JPEG. The "original photos" run inlines
+the full upload, as exports did before thumbnails; the thumbnail runs use the
+240px copies made at upload time, first with a cold data URI cache and then warm.
+Needs a working WeasyPrint (Pango) install.
+
+    python benchmarks/pdf_photos.py [--students 500] [--photo-size 3000x4000]
+"""
+import argparse
+import io
+import os
+import time
+
+from common import bench_database, connect, ems, print_header, seed_school
+
+
+def make_photos(count, size):
+    """Writes one phone-sized JPEG per student and returns the file names.
+
+    Blurred noise compresses like a real photo (about 4 MB at 12 MP). The files
+    share their bytes, which is fine: the data URI cache is keyed by path.
+    """
+    from PIL import Image, ImageFilter
+    os.makedirs(ems.app.config['UPLOAD_FOLDER'], exist_ok=True)
+    photo = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').filter(ImageFilter.GaussianBlur(1)).save(photo, 'JPEG', quality=90)
+    filenames = []
+    for n in range(count):
+        filename = f'bench_{n}.jpg'
+        with open(os.path.join(ems.app.config['UPLOAD_FOLDER'], filename), 'wb') as f:
+            f.write(photo.getvalue())
+        filenames.append(filename)
+    return filenames
+
+
+def render(label, path):
+    started = time.perf_counter()
+    with ems.app.app_context():
+        ems.render_students_pdf(path)
+    seconds = time.perf_counter() - started
+    print(f"{label:<28}{seconds:>8.2f} s{os.path.getsize(path) / 1024 / 1024:>10.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--photo-size', default='3000x4000', help='WIDTHxHEIGHT of each generated photo')
+    args = parser.parse_args()
+    size = tuple(int(part) for part in args.photo_size.split('x'))
+
+    with bench_database():
+        seed_school(args.students, classes=10)
+        filenames = make_photos(args.students, size)
+        conn = connect()
+        with conn:
+            conn.executemany("UPDATE students SET photo_filename = ? WHERE id = ?",
+                             [(filename, n + 1) for n, filename in enumerate(filenames)])
+        conn.close()
+        upload_bytes = sum(os.path.getsize(os.path.join(ems.app.config['UPLOAD_FOLDER'], f)) for f in filenames)
+        output = os.path.join(ems.app.config['EXPORT_FOLDER'], 'bench.pdf')
+
+        print_header(f"Student PDF, {args.students} students, {args.photo_size} photos "
+                     f"({upload_bytes / 1024 / 1024:.0f} MiB of uploads)")
+        thumbnail_data_uri = ems.photo_data_uri
+        # The original upload, read and encoded on every use as before (bypassing the LRU cache).
+        original_data_uri = lambda filename: ems._cached_data_uri.__wrapped__(
+            os.path.join(ems.app.config['UPLOAD_FOLDER'], filename), None, None)
+        # Uploads create thumbnails as they arrive, so that cost is outside the export.
+        for filename in filenames:
+            ems.create_thumbnail(filename)
+        for label, data_uri in (('original photos', original_data_uri), ('thumbnails', thumbnail_data_uri)):
+            inlined = sum(len(data_uri(filename)) for filename in filenames)
+            print(f"HTML-inlined photo data, {label:<16}{inlined / 1024 / 1024:>8.1f} MiB")
+        ems._cached_data_uri.cache_clear()
+
+        print(f"\n{'':<28}{'time':>10}{'size':>14}")
+        ems.photo_data_uri = original_data_uri
+        render('original photos', output)
+        ems.photo_data_uri = thumbnail_data_uri
+        ems._cached_data_uri.cache_clear()
+        render('thumbnails, cold cache', output)
+        render('thumbnails, warm cache', output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Student PDF render time for a 1-page and a ~50-page roster: per-export vs shared stylesheets.
+
+"Per-export" drops the cached FontConfiguration and parsed stylesheets before
+every render, which is what each export paid before reports.py shared them;
+"shared" renders with them already built, as a warmed-up worker does.
+Needs a working WeasyPrint (Pango) install.
+
+    python benchmarks/pdf_stylesheets.py [--repeat 5]
+"""
+import argparse
+import os
+
+from common import bench_database, ems, measure, print_header, seed_school, summary
+
+reports = ems.reports
+
+# Roster sizes that lay out to roughly 1 and 50 pages with the students stylesheet.
+ROSTERS = (('1 page', 4), ('~50 pages', 500))
+
+
+def page_count(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print_header(f"Student PDF render, {args.repeat} runs each")
+    for label, students in ROSTERS:
+        with bench_database():
+            seed_school(students, classes=1)
+            output = os.path.join(ems.app.config['EXPORT_FOLDER'], 'bench.pdf')
+
+            def render():
+                with ems.app.app_context():
+                    ems.render_students_pdf(output)
+
+            def render_cold():
+                reports._font_config = None
+                reports._stylesheets.clear()
+                render()
+
+            cold = measure(render_cold, args.repeat)
+            reports.warm_up()
+            warm = measure(render, args.repeat)
+            print(f"{label} ({students} students, {page_count(output)} pages)")
+            print(f"  per-export stylesheets  {summary(cold)}")
+            print(f"  shared stylesheets      {summary(warm)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Printing a class's report cards: one /api/results/report-cards call vs one student-report call per student.
+
+Query counts are the SQL statements the app sends to SQLite while serving the
+requests, collected with a trace callback on every pooled connection.
+
+    python benchmarks/report_cards.py [--class-sizes 10 40 200] [--subjects 8] [--repeat 10]
+"""
+import argparse
+
+from common import bench_database, ems, login, measure, print_header, seed_results, seed_school, summary
+
+statements = []
+_configure_connection = ems.configure_connection
+
+
+def traced_configure_connection(conn):
+    conn = _configure_connection(conn)
+    conn.set_trace_callback(statements.append)
+    return conn
+
+
+def count_queries(fn):
+    statements.clear()
+    fn()
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--class-sizes', type=int, nargs='+', default=[10, 40, 200])
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    ems.configure_connection = traced_configure_connection
+    print_header(f"Report cards for one class, {args.subjects} subjects, {args.repeat} runs each")
+    print(f"{'students':>8}   {'':<22}{'queries':>8}   latency")
+    for students in args.class_sizes:
+        with bench_database() as client:
+            (class_id,), subject_ids = seed_school(students, subjects=args.subjects)
+            seed_results(class_id, subject_ids)
+            headers = login(client)
+            query = {'exam_type': 'Monthly'}
+            student_ids = range(1, students + 1)
+
+            def per_student():
+                for student_id in student_ids:
+                    response = client.get(f'/api/results/student-report/{student_id}', headers=headers, query_string=query)
+                    assert response.status_code == 200
+
+            def batch():
+                response = client.get('/api/results/report-cards', headers=headers,
+                                      query_string={**query, 'class_id': class_id})
+                assert len(response.get_json()['report_cards']) == students
+
+            for label, fn in ((f'{students} student-report calls', per_student), ('1 report-cards call', batch)):
+                fn()  # Opens the pooled connection so its pragmas are not counted.
+                queries = count_queries(fn)
+                print(f"{students:>8}   {label:<22}{queries:>8}   {summary(measure(fn, args.repeat))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Student search latency at 50k students: FTS5 trigram index vs the LIKE scan it replaced.
+
+The LIKE numbers come from the same endpoint with FTS_MIN_TERM_LENGTH raised,
+which sends every term down the original three-column LIKE path.
+
+    python benchmarks/search.py [--students 50000] [--repeat 50]
+"""
+import argparse
+
+from common import bench_database, ems, login, measure, print_header, seed_school, summary
+
+KHMER_SYLLABLES = ('សុខ', 'ចាន់', 'ដារ៉ា', 'វិសាល', 'ស្រីនាង', 'បុប្ផា', 'រតនា', 'សុភា')
+LATIN_NAMES = ('Sok', 'Chan', 'Dara', 'Visal', 'Sreyneang', 'Bopha', 'Rathana', 'Sophea')
+KANA_NAMES = ('ソク', 'チャン', 'ダラ', 'ヴィサール', 'スレイニアン', 'ボパー', 'ラタナ', 'ソピア')
+
+TERMS = (
+    ('common Latin', 'Dara'),
+    ('rare Latin', 'Visal 4999'),
+    ('Khmer', 'វិសាល'),
+    ('Japanese', 'ボパー'),
+    ('no match', 'Zzyzx'),
+)
+
+
+def student_names(n):
+    first, last = n % len(LATIN_NAMES), (n // len(LATIN_NAMES)) % len(LATIN_NAMES)
+    return (f'{KHMER_SYLLABLES[first]} {KHMER_SYLLABLES[last]} {n}',
+            f'{LATIN_NAMES[first]} {LATIN_NAMES[last]} {n}',
+            f'{KANA_NAMES[first]}・{KANA_NAMES[last]} {n}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with bench_database() as client:
+        seed_school(args.students, classes=100, names=student_names)
+        headers = login(client)
+        fts_min_term_length = ems.FTS_MIN_TERM_LENGTH
+
+        print_header(f"GET /api/students?search=..., {args.students} students, {args.repeat} runs each")
+        for label, term in TERMS:
+            def search():
+                assert client.get('/api/students', headers=headers, query_string={'search': term}).status_code == 200
+
+            ems.FTS_MIN_TERM_LENGTH = 10 ** 6
+            like = measure(search, args.repeat)
+            ems.FTS_MIN_TERM_LENGTH = fts_min_term_length
+            fts = measure(search, args.repeat)
+            print(f"{label:<13} LIKE  {summary(like)}")
+            print(f"{'':<13} FTS5  {summary(fts)}")
+
+
+if __name__ == '__main__':
+    main()
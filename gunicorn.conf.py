@@ -0,0 +1,11 @@
+# gunicorn.conf.py (read automatically by gunicorn from the working directory)
+
+
+def post_fork(server, worker):
+    # Parse the PDF stylesheets and load the report fonts in each web worker right
+    # after it forks, instead of on `import app` (which CLI commands and the export
+    # pool's children also do). REPORT_WARMUP=0 turns it off.
+    import os
+    if os.environ.get('REPORT_WARMUP', '1') != '0':
+        import reports
+        reports.start_warm_up()
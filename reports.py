@@ -0,0 +1,254 @@
+# reports.py (Shared WeasyPrint rendering setup for PDF exports)
+#
+# Parsing the @font-face stylesheets and loading KhmerOS / Noto Sans JP through
+# fontconfig is the expensive part of every export. Here it happens once per
+# worker process: the parsed stylesheets and one FontConfiguration are built on
+# first use (or by warm_up() after a gunicorn worker forks) and reused by every
+# render. WeasyPrint and pypdf are imported on first use too, so importing this
+# module (and app) stays cheap for CLI commands and export pool children.
+
+import gc
+import os
+import shutil
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_FOLDER = os.path.join(BASE_DIR, 'fonts')
+KHMER_TTF = os.path.join(FONT_FOLDER, 'KhmerOS.ttf')
+JAPANESE_TTF = os.path.join(FONT_FOLDER, 'NotoSansJP-Regular.ttf')
+
+FONT_FACES_CSS = f"""
+@font-face {{ font-family: 'KhmerApp'; src: url(file://{KHMER_TTF}); }}
+@font-face {{ font-family: 'JapaneseApp'; src: url(file://{JAPANESE_TTF}); }}
+* {{ font-family: 'KhmerApp', 'JapaneseApp', sans-serif; }}
+"""
+
+STYLESHEET_SOURCES = {
+    'students': """
+        body { font-size: 10pt; }
+        .header {
+            display: flex; align-items: center; gap: 20px;
+            padding-bottom: 15px; margin-bottom: 15px; border-bottom: 2px solid #000;
+        }
+        .header-logo { width: 60px; height: 60px; }
+        .header-text h1 { margin: 0; font-size: 20pt; }
+        .header-text p { margin: 0; font-size: 12pt; color: #555; }
+        table { width: 100%; border-collapse: collapse; }
+        th, td {
+            border: 1px solid #ccc; padding: 8px;
+            vertical-align: middle; text-align: left;
+        }
+        th { background-color: #f2f2f2; font-weight: bold; text-align: center; }
+        td img, .img-placeholder {
+            width: 120px; height: 120px;
+            object-fit: cover; border-radius: 8px;
+            display: block; margin: auto;
+        }
+        .img-placeholder { background-color: #eee; }
+        .name-km { font-weight: bold; font-size: 1.1em; }
+        .name-en, .name-jp { font-size: 1em; color: #333; }
+    """,
+    'timetable': """
+        body { font-size: 9pt; }
+        .header { display: flex; align-items: center; gap: 20px; padding-bottom: 15px; margin-bottom: 15px; border-bottom: 2px solid #000; }
+        .header-logo { width: 60px; }
+        .header-text h1, .header-text p { margin: 0; }
+        table { width: 100%; border-collapse: collapse; table-layout: fixed; }
+        th, td { border: 1px solid #ccc; padding: 5px; vertical-align: top; text-align: center; height: 60px; }
+        th { background-color: #f2f2f2; font-weight: bold; }
+        .time-label { font-weight: bold; vertical-align: middle; }
+        .schedule-entry-pdf { background: #eef2ff; border-left: 3px solid #4f46e5; border-radius: 4px; padding: 4px; margin-bottom: 3px; text-align: left; font-size: 8pt; }
+        .schedule-entry-pdf strong { display: block; }
+        .schedule-entry-pdf p { margin: 2px 0 0; color: #555; }
+    """,
+}
+
+_font_config = None
+_stylesheets = {}
+_build_lock = threading.Lock()
+# WeasyPrint makes no thread-safety promises for a shared FontConfiguration, so
+# renders inside one process take turns; parallelism comes from worker processes.
+_render_lock = threading.Lock()
+
+
+def _reset_locks_after_fork():
+    # A fork taken while another thread held a lock would leave it held forever in the child.
+    global _build_lock, _render_lock
+    _build_lock = threading.Lock()
+    _render_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def get_font_config():
+    global _font_config
+    if _font_config is None:
+        with _build_lock:
+            if _font_config is None:
+                from weasyprint.text.fonts import FontConfiguration
+                _font_config = FontConfiguration()
+    return _font_config
+
+
+def get_stylesheet(name):
+    """Returns the parsed stylesheet for a report, building it on first use."""
+    stylesheet = _stylesheets.get(name)
+    if stylesheet is None:
+        font_config = get_font_config()
+        with _build_lock:
+            stylesheet = _stylesheets.get(name)
+            if stylesheet is None:
+                from weasyprint import CSS
+                stylesheet = CSS(string=FONT_FACES_CSS + STYLESHEET_SOURCES[name], font_config=font_config)
+                _stylesheets[name] = stylesheet
+    return stylesheet
+
+
+def render_pdf(html_string, stylesheet_name, target=None):
+    """Renders HTML with a shared stylesheet; writes to target or returns the PDF bytes."""
+    from weasyprint import HTML
+    stylesheet = get_stylesheet(stylesheet_name)
+    with _render_lock:
+        return HTML(string=html_string, base_url=BASE_DIR).write_pdf(
+            target, stylesheets=[stylesheet], font_config=get_font_config()
+        )
+
+
+def merge_pdfs(paths, target):
+    """Concatenates PDF files into target (a path or binary file object).
+
+    The chunks are streamed: each one is parsed, its pages and everything they
+    reference are written out with renumbered objects, and it is released before
+    the next is opened. Peak memory is one chunk plus a few integers per page and
+    object, however many chunks there are. Only pages are carried over; chunk-level
+    extras such as outlines and metadata are dropped.
+    """
+    if len(paths) == 1:
+        if isinstance(target, (str, os.PathLike)):
+            shutil.copyfile(paths[0], target)
+        else:
+            with open(paths[0], 'rb') as source:
+                shutil.copyfileobj(source, target)
+        return
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'wb') as target_file:
+            _concatenate_pdfs(paths, target_file)
+    else:
+        _concatenate_pdfs(paths, target)
+
+
+class _CountingWriter:
+    """Tracks the byte offset of a write-only file object, for the xref table."""
+
+    def __init__(self, target):
+        self.target = target
+        self.offset = 0
+
+    def write(self, data):
+        self.target.write(data)
+        self.offset += len(data)
+        return len(data)
+
+
+# Objects 1 and 2 are the merged catalog and page tree; chunk objects are numbered after them.
+_CATALOG_ID, _PAGES_ID = 1, 2
+
+
+def _concatenate_pdfs(paths, target):
+    from pypdf import PdfReader
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+    out = _CountingWriter(target)
+    offsets = {}
+    page_ids = []
+    next_id = _PAGES_ID + 1
+    out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def write_object(object_id, obj):
+        offsets[object_id] = out.offset
+        out.write(f"{object_id} 0 obj\n".encode())
+        obj.write_to_stream(out)
+        out.write(b"\nendobj\n")
+
+    for path in paths:
+        reader = PdfReader(path)
+        # Maps this chunk's (idnum, generation) to merged object ids; dropped with the chunk.
+        ids = {}
+        pending = []
+
+        def relink(value):
+            """Points every indirect reference inside value at its merged object id, queueing new ones."""
+            nonlocal next_id
+            if isinstance(value, IndirectObject):
+                key = (value.idnum, value.generation)
+                if key not in ids:
+                    ids[key] = next_id
+                    pending.append((value, next_id))
+                    next_id += 1
+                return IndirectObject(ids[key], 0, None)
+            if isinstance(value, DictionaryObject):
+                for name, item in list(dict.items(value)):
+                    if not (name == '/Length' and isinstance(value, StreamObject)):
+                        dict.__setitem__(value, name, relink(item))
+            elif isinstance(value, ArrayObject):
+                for index, item in enumerate(value):
+                    list.__setitem__(value, index, relink(item))
+            return value
+
+        root_pages = dict.get(reader.trailer['/Root'], '/Pages')
+        if isinstance(root_pages, IndirectObject):
+            ids[(root_pages.idnum, root_pages.generation)] = _PAGES_ID
+        # Number every page first so links and annotations between pages resolve inside the chunk.
+        pages = list(reader.pages)
+        for page in pages:
+            reference = page.indirect_reference
+            ids[(reference.idnum, reference.generation)] = next_id
+            page_ids.append(next_id)
+            next_id += 1
+        for page in pages:
+            # reader.pages has already copied inherited attributes (MediaBox, Resources) onto each page.
+            dict.__setitem__(page, NameObject('/Parent'), IndirectObject(_PAGES_ID, 0, None))
+            reference = page.indirect_reference
+            for name, item in list(dict.items(page)):
+                if name != '/Parent':
+                    dict.__setitem__(page, name, relink(item))
+            write_object(ids[(reference.idnum, reference.generation)], page)
+            while pending:
+                reference, object_id = pending.pop()
+                write_object(object_id, relink(reference.get_object()))
+        del reader, pages
+        # Parsed objects point back at their reader, so the chunk is only freed by the cycle collector.
+        gc.collect()
+
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    offsets[_PAGES_ID] = out.offset
+    out.write(f"{_PAGES_ID} 0 obj\n<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>\nendobj\n".encode())
+    offsets[_CATALOG_ID] = out.offset
+    out.write(f"{_CATALOG_ID} 0 obj\n<< /Type /Catalog /Pages {_PAGES_ID} 0 R >>\nendobj\n".encode())
+
+    xref_offset = out.offset
+    out.write(f"xref\n0 {next_id}\n0000000000 65535 f \n".encode())
+    for object_id in range(1, next_id):
+        out.write(f"{offsets.get(object_id, 0):010d} 00000 {'n' if object_id in offsets else 'f'} \n".encode())
+    out.write(f"trailer\n<< /Size {next_id} /Root {_CATALOG_ID} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def warm_up():
+    """Parses every stylesheet and lays out a tiny page so the fonts are loaded before the first export."""
+    for name in STYLESHEET_SOURCES:
+        get_stylesheet(name)
+    render_pdf("<p>ខ្មែរ English 日本語</p>", 'students')
+
+
+def start_warm_up():
+    """Warms the renderer in a daemon thread so worker boot is not delayed.
+
+    Called from gunicorn's post_fork hook (gunicorn.conf.py), so only web workers
+    pay for it; CLI commands and export pool children render on demand.
+    """
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"--- WARNING: Report renderer warm-up failed: {e}")
+    threading.Thread(target=run, name='report-warm-up', daemon=True).start()
@@ -23,9 +23,12 @@ export async function fetchWithAuth(url, options = {}) {
         headers['Content-Type'] = 'application/json';
     }
 
+    const method = options.method || 'GET';
     const fetchOptions = {
-        method: options.method || 'GET',
+        method,
         headers,
+        // GET ត្រូវ revalidate ជាមួយ ETag: server ឆ្លើយ 304 ហើយ browser ប្រើ cache ដដែល
+        cache: method === 'GET' ? 'no-cache' : 'default',
         body: options.body ? (
             headers['Content-Type'] === 'application/json'
                 ? JSON.stringify(options.body)
@@ -3,6 +3,8 @@ import { fetchWithAuth, API_BASE_URL } from '../api.js';
 import { showNotification, showLoader } from './ui.js';
 
 let announcementsCache = [];
+let nextCursor = null;
+const ANNOUNCEMENTS_PAGE_SIZE = 20;
 
 function renderAnnouncementsList(container, t) {
     if (announcementsCache.length === 0) {
@@ -33,15 +35,25 @@ function renderAnnouncementsList(container, t) {
         `;
     }).join('');
 
-    container.innerHTML = announcementCards;
+    const loadMoreButton = nextCursor
+        ? `<div style="text-align: center; margin-top: 1rem;"><button id="load-more-announcements" class="btn">${t.load_more || 'Load more'}</button></div>`
+        : '';
+
+    container.innerHTML = announcementCards + loadMoreButton;
+}
+
+async function fetchAnnouncementsPage(params) {
+    const response = await fetchWithAuth(`${API_BASE_URL}/api/announcements?${new URLSearchParams(params)}`);
+    if (!response.ok) throw new Error('Failed to load announcements.');
+    return response.json();
 }
 
 async function loadAnnouncements(container, t) {
     showLoader(container);
     try {
-        const response = await fetchWithAuth(`${API_BASE_URL}/api/announcements`);
-        if (!response.ok) throw new Error('Failed to load announcements.');
-        announcementsCache = await response.json();
+        const page = await fetchAnnouncementsPage({ limit: ANNOUNCEMENTS_PAGE_SIZE });
+        announcementsCache = page.data;
+        nextCursor = page.next_cursor;
         renderAnnouncementsList(container, t);
     } catch (e) {
         showNotification(e.message, 'error');
@@ -49,6 +61,38 @@ async function loadAnnouncements(container, t) {
     }
 }
 
+async function loadMoreAnnouncements(container, t) {
+    try {
+        const page = await fetchAnnouncementsPage({ limit: ANNOUNCEMENTS_PAGE_SIZE, after: nextCursor });
+        announcementsCache = announcementsCache.concat(page.data);
+        nextCursor = page.next_cursor;
+        renderAnnouncementsList(container, t);
+    } catch (e) {
+        showNotification(e.message, 'error');
+    }
+}
+
+// Fetch only what was posted since the newest announcement we already have
+async function loadNewAnnouncements(container, t) {
+    if (announcementsCache.length === 0) {
+        await loadAnnouncements(container, t);
+        return;
+    }
+    const latestId = Math.max(...announcementsCache.map(ann => ann.id));
+    // More than a page may have been posted since; follow next_cursor so none are skipped.
+    let newAnnouncements = [];
+    let cursor = null;
+    do {
+        const params = { since: latestId, limit: ANNOUNCEMENTS_PAGE_SIZE };
+        if (cursor) params.after = cursor;
+        const page = await fetchAnnouncementsPage(params);
+        newAnnouncements = newAnnouncements.concat(page.data);
+        cursor = page.next_cursor;
+    } while (cursor);
+    announcementsCache = newAnnouncements.concat(announcementsCache);
+    renderAnnouncementsList(container, t);
+}
+
 async function handleAnnouncementSubmit(event, t) {
     event.preventDefault();
     const form = event.target;
@@ -68,7 +112,7 @@ async function handleAnnouncementSubmit(event, t) {
         }
         showNotification('Announcement posted successfully!', 'success');
         form.reset();
-        await loadAnnouncements(document.getElementById('announcements-list-container'), t);
+        await loadNewAnnouncements(document.getElementById('announcements-list-container'), t);
     } catch (e) {
         showNotification(e.message, 'error');
     }
@@ -81,7 +125,8 @@ async function deleteAnnouncement(id, t) {
         const response = await fetchWithAuth(`${API_BASE_URL}/api/announcements/${id}`, { method: 'DELETE' });
         if (!response.ok) throw new Error('Failed to delete.');
         showNotification('Announcement deleted!', 'success');
-        await loadAnnouncements(document.getElementById('announcements-list-container'), t);
+        announcementsCache = announcementsCache.filter(ann => ann.id !== id);
+        renderAnnouncementsList(document.getElementById('announcements-list-container'), t);
     } catch (e) {
         showNotification(e.message, 'error');
     }
@@ -122,6 +167,10 @@ export async function renderAnnouncementModule(contentEl, t) {
     }
 
     listContainer.addEventListener('click', (e) => {
+        if (e.target && e.target.id === 'load-more-announcements') {
+            loadMoreAnnouncements(listContainer, t);
+            return;
+        }
         const deleteBtn = e.target.closest('.btn-delete');
         if (deleteBtn) {
             const id = parseInt(deleteBtn.dataset.id);
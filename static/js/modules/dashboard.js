@@ -156,22 +156,13 @@ export async function renderDashboard(contentEl, t) {
     contentEl.innerHTML = html;
 
     try {
-        // Fetch all data concurrently
-        const [statsRes, classSizesRes, userRolesRes, announcementsRes] = await Promise.all([
-            fetchWithAuth(`${API_BASE_URL}/api/dashboard/stats`),
-            fetchWithAuth(`${API_BASE_URL}/api/dashboard/class-sizes`),
-            fetchWithAuth(`${API_BASE_URL}/api/dashboard/user-roles`),
-            fetchWithAuth(`${API_BASE_URL}/api/announcements`) // Fetch announcements
-        ]);
-
-        if (!statsRes.ok || !classSizesRes.ok || !userRolesRes.ok || !announcementsRes.ok) {
+        // One round trip: the server bundles stats, charts and recent announcements
+        const response = await fetchWithAuth(`${API_BASE_URL}/api/dashboard/summary`);
+        if (!response.ok) {
             throw new Error('Failed to load some dashboard data.');
         }
 
-        const stats = await statsRes.json();
-        const classSizes = await classSizesRes.json();
-        const userRoles = await userRolesRes.json();
-        const announcements = await announcementsRes.json();
+        const { stats, class_sizes: classSizes, user_roles: userRoles, announcements } = await response.json();
 
         // Update stat cards
         document.getElementById('stats-students').textContent = stats.students;
@@ -7,15 +7,17 @@ let classesCache = [];
 let teachersCache = [];
 let subjectsCache = [];
 let timetableCache = [];
+let periodsCache = [];
 
 /**
  * គ្រប់គ្រងមុខងារនាំចេញជា PDF សម្រាប់កាលវិភាគរបស់ថ្នាក់ដែលបានជ្រើសរើស។
- * @param {string} classId - លេខសម្គាល់របស់ថ្នាក់ដែលត្រូវនាំចេញ។
+ * @param {string} classId - លេខសម្គាល់របស់ថ្នាក់ដែលត្រូវនាំចេញ (ទទេ = គ្រប់ថ្នាក់ទាំងអស់)។
  * @param {string} lang - លេខកូដភាសា hiện tại (ឧ. 'km', 'en')។
  * @param {object} t - Object បកប្រែសម្រាប់ភាសាปัจจุบัน។
  */
 async function handleTimetableExport(classId, lang, t) {
-    const button = document.getElementById('btn-export-timetable-pdf');
+    const allClasses = !classId;
+    const button = document.getElementById(allClasses ? 'btn-export-all-timetables-pdf' : 'btn-export-timetable-pdf');
     if (!button) return;
 
     const originalText = button.innerHTML;
@@ -23,7 +25,8 @@ async function handleTimetableExport(classId, lang, t) {
     button.disabled = true;
 
     try {
-        const response = await fetchWithAuth(`${API_BASE_URL}/api/timetables/export/pdf?class_id=${classId}&lang=${lang}`);
+        const query = allClasses ? 'all=1' : `class_id=${classId}`;
+        const response = await fetchWithAuth(`${API_BASE_URL}/api/timetables/export/pdf?${query}&lang=${lang}`);
         if (!response.ok) {
             const err = await response.json();
             throw new Error(err.message || 'ការនាំចេញបានបរាជ័យ');
@@ -32,7 +35,7 @@ async function handleTimetableExport(classId, lang, t) {
         const blob = await response.blob();
         const downloadUrl = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
-        const className = classesCache.find(c => c.id == classId)?.name || 'timetable';
+        const className = allClasses ? 'all_classes' : (classesCache.find(c => c.id == classId)?.name || 'timetable');
         a.href = downloadUrl;
         a.download = `${className}_timetable.pdf`;
         document.body.appendChild(a);
@@ -61,42 +64,61 @@ function renderTimetableGrid(container, t) {
         t.day_thu || 'ព្រហស្បតិ៍', t.day_fri || 'សុក្រ', t.day_sat || 'សៅរ៍',
         t.day_sun || 'អាទិត្យ'
     ];
-    const timeSlots = [
-        '07:00 - 08:00', '08:00 - 09:00', '09:00 - 10:00', '10:00 - 11:00', '11:00 - 12:00',
-        '13:00 - 14:00', '14:00 - 15:00', '15:00 - 16:00', '16:00 - 17:00'
-    ];
+    // ជួរដេកគឺម៉ោងសិក្សាដែលសាលាកំណត់ (/api/timetables/periods)
+    const rows = periodsCache.map(p => ({
+        start: p.start_time, end: p.end_time,
+        label: p.label || `${p.start_time} - ${p.end_time}`
+    }));
+
+    // ដាក់รายการនីមួយៗក្នុងគ្រប់ម៉ោងដែលវាត្រួតលើ ដូច្នេះម៉ោងទ្វេបង្ហាញពីរជួរ
+    // รายการដែលមិនត្រូវនឹងម៉ោងណាមួយ ទទួលបានជួរផ្ទាល់ខ្លួន ជាជាងត្រូវបាត់
+    const grid = new Map();
+    const extraRows = new Map();
+    timetableCache.forEach(entry => {
+        const start = entry.start_time.slice(0, 5);
+        const end = entry.end_time.slice(0, 5);
+        let rowKeys = rows.filter(row => row.start < end && start < row.end).map(row => row.start + '-' + row.end);
+        if (rowKeys.length === 0) {
+            const key = start + '-' + end;
+            extraRows.set(key, { start, end, label: `${start} - ${end}` });
+            rowKeys = [key];
+        }
+        rowKeys.forEach(key => {
+            const cellKey = `${entry.day_of_week}|${key}`;
+            if (!grid.has(cellKey)) grid.set(cellKey, []);
+            grid.get(cellKey).push(entry);
+        });
+    });
+    const allRows = [...rows, ...extraRows.values()].sort((a, b) => a.start.localeCompare(b.start));
 
     // ប្រើ translation key សម្រាប់បឋមកថាតារាង
     let headerHtml = `<th>${t.timetable_header || 'ម៉ោង / ថ្ងៃ'}</th>`;
     days.forEach(day => headerHtml += `<th>${day}</th>`);
 
     let bodyHtml = '';
-    timeSlots.forEach(slot => {
-        const startTime = slot.split(' - ')[0];
-        bodyHtml += `<tr><td class="time-slot-label">${slot}</td>`;
-        for (let dayIndex = 0; dayIndex < 7; dayIndex++) {
-            // Data attributes ទាក់ទងនឹងតម្លៃក្នុងฐานข้อมูล (1-7 សម្រាប់ day_of_week)
-            bodyHtml += `<td data-day="${dayIndex + 1}" data-time="${startTime}"></td>`;
+    allRows.forEach(row => {
+        const rowKey = row.start + '-' + row.end;
+        bodyHtml += `<tr><td class="time-slot-label">${row.label}</td>`;
+        for (let dayIndex = 1; dayIndex <= 7; dayIndex++) {
+            // dayIndex ទាក់ទងនឹងតម្លៃក្នុងฐานข้อมูล (1-7 សម្រាប់ day_of_week)
+            const entriesHtml = (grid.get(`${dayIndex}|${rowKey}`) || []).map(entry => {
+                const entryKey = entry.start_time.slice(0, 5) + '-' + entry.end_time.slice(0, 5);
+                const timesHtml = entryKey !== rowKey ? `<p>${entry.start_time.slice(0, 5)} - ${entry.end_time.slice(0, 5)}</p>` : '';
+                return `
+                    <div class="schedule-entry">
+                        <strong>${entry.subject_name}</strong>
+                        <p>${entry.teacher_name}</p>
+                        ${timesHtml}
+                        <button class="btn-delete-entry" data-id="${entry.id}">&times;</button>
+                    </div>
+                `;
+            }).join('');
+            bodyHtml += `<td data-day="${dayIndex}" data-time="${row.start}">${entriesHtml}</td>`;
         }
         bodyHtml += '</tr>';
     });
 
     container.innerHTML = `<div class="table-responsive"><table class="timetable-grid"><thead><tr>${headerHtml}</tr></thead><tbody>${bodyHtml}</tbody></table></div>`;
-
-    // បញ្ចូលទិន្នន័យจากឃ្លាំងសម្ងាត់ទៅក្នុងក្រឡាចត្រង្គបន្ទាប់ពីបង្ហាញโครงสร้าง
-    timetableCache.forEach(entry => {
-        const cell = container.querySelector(`td[data-day='${entry.day_of_week}'][data-time='${entry.start_time}']`);
-        if (cell) {
-            // បន្ថែម HTML របស់รายการកាលវិភាគទៅក្នុងក្រឡាที่ถูกต้อง
-            cell.innerHTML += `
-                <div class="schedule-entry">
-                    <strong>${entry.subject_name}</strong>
-                    <p>${entry.teacher_name}</p>
-                    <button class="btn-delete-entry" data-id="${entry.id}">&times;</button>
-                </div>
-            `;
-        }
-    });
 }
 
 /**
@@ -111,13 +133,14 @@ export async function renderTimetableModule(contentEl, t) {
     
     try {
         // ទាញទិន្នន័យที่จำเป็นพร้อมกันเพื่อประสิทธิภาพที่ดีขึ้น
-        const [classesRes, teachersRes, subjectsRes] = await Promise.all([
+        const [classesRes, teachersRes, subjectsRes, periodsRes] = await Promise.all([
             fetchWithAuth(`${API_BASE_URL}/api/classes`),
             fetchWithAuth(`${API_BASE_URL}/api/teachers`),
-            fetchWithAuth(`${API_BASE_URL}/api/subjects`)
+            fetchWithAuth(`${API_BASE_URL}/api/subjects`),
+            fetchWithAuth(`${API_BASE_URL}/api/timetables/periods`)
         ]);
 
-        if (!classesRes.ok || !teachersRes.ok || !subjectsRes.ok) {
+        if (!classesRes.ok || !teachersRes.ok || !subjectsRes.ok || !periodsRes.ok) {
             throw new Error('ការផ្ទុកទិន្នន័យដំបូងសម្រាប់កាលវិភាគបានបរាជ័យ');
         }
 
@@ -129,6 +152,7 @@ export async function renderTimetableModule(contentEl, t) {
         classesCache = classesResult.data || classesResult;
         teachersCache = teachersResult.data || teachersResult;
         subjectsCache = subjectsResult.data || subjectsResult;
+        periodsCache = await periodsRes.json();
 
         // រៀបចំตัวเลือกสำหรับ dropdown จากข้อมูลในឃ្លាំងសម្ងាត់
         const classOptions = classesCache.map(c => `<option value="${c.id}">${c.name}</option>`).join('');
@@ -170,6 +194,7 @@ export async function renderTimetableModule(contentEl, t) {
                     <div id="timetable-actions" style="display:none;">
                         <button id="btn-export-timetable-pdf" class="btn"><i class="fa-regular fa-file-pdf"></i> ${t.export_pdf || 'នាំចេញជា PDF'}</button>
                     </div>
+                    <button id="btn-export-all-timetables-pdf" class="btn"><i class="fa-regular fa-file-pdf"></i> ${t.export_all_timetables_pdf || 'នាំចេញគ្រប់ថ្នាក់ជា PDF'}</button>
                 </div>
             </div>
 
@@ -243,6 +268,11 @@ export async function renderTimetableModule(contentEl, t) {
             }
         });
 
+        // នាំចេញកាលវិភាគគ្រប់ថ្នាក់ទៅក្នុង PDF តែមួយ
+        document.getElementById('btn-export-all-timetables-pdf').addEventListener('click', () => {
+            handleTimetableExport('', lang, t);
+        });
+
         // គ្រប់គ្រងការលុបรายการកាលវិភាគ (เฉพาะ admin)
         gridContainer.addEventListener('click', async (e) => {
             if (isAdmin && e.target.classList.contains('btn-delete-entry')) {
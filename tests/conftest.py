@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Cheap hashes for the default admin, and no PDF warm-up thread in the test process.
+os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+os.environ.setdefault('REPORT_WARMUP', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as ems  # noqa: E402
+
+
+@pytest.fixture
+def sql_log(monkeypatch):
+    """Every statement run on pooled connections opened during the test, with parameters expanded."""
+    statements = []
+    configure_connection = ems.configure_connection
+
+    def traced(conn):
+        configure_connection(conn)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(ems, 'configure_connection', traced)
+    return statements
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch, sql_log):
+    """A freshly migrated database in tmp_path, with uploads and exports beside it."""
+    upload_folder = str(tmp_path / 'uploads')
+    monkeypatch.setattr(ems, 'DATABASE_FILE', str(tmp_path / 'ems_database.db'))
+    monkeypatch.setattr(ems, 'UPLOAD_FOLDER', upload_folder)
+    monkeypatch.setattr(ems, 'THUMBNAIL_FOLDER', os.path.join(upload_folder, 'thumbs'))
+    monkeypatch.setitem(ems.app.config, 'UPLOAD_FOLDER', upload_folder)
+    monkeypatch.setitem(ems.app.config, 'EXPORT_FOLDER', str(tmp_path / 'exports'))
+    monkeypatch.setattr(ems, '_pool', None)
+    monkeypatch.setattr(ems, '_dashboard_cache', (None, None))
+    ems.init_database()
+    sql_log.clear()
+    yield ems.DATABASE_FILE
+    # Write buffered logins now, while DATABASE_FILE still points here rather than at exit.
+    ems.flush_last_logins()
+    if ems._pool is not None:
+        ems._pool.close_all()
+
+
+@pytest.fixture
+def db(database):
+    """A direct connection for seeding and inspecting the test database."""
+    conn = ems.configure_connection(sqlite3.connect(database))
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def client(database):
+    return ems.app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
@@ -0,0 +1,36 @@
+"""Seeding and query-plan helpers shared by the tests."""
+
+
+def add_students(conn, count, class_id=None, prefix='Student'):
+    """Inserts count students (optionally enrolled in class_id) and returns their ids."""
+    ids = []
+    for n in range(count):
+        cursor = conn.execute(
+            "INSERT INTO students (name, name_km, name_en, dob, contact) VALUES (?, ?, ?, '2010-01-01', '012')",
+            (f'{prefix} {n}', f'{prefix} {n}', f'{prefix} {n}'))
+        ids.append(cursor.lastrowid)
+        if class_id is not None:
+            conn.execute("INSERT INTO enrollments (student_id, class_id) VALUES (?, ?)", (cursor.lastrowid, class_id))
+    conn.commit()
+    return ids
+
+
+def add_class(conn, name='Class A'):
+    teacher_id = conn.execute("INSERT INTO teachers (name, email, contact) VALUES ('Teacher', ?, '012')",
+                              (f'{name.lower().replace(" ", ".")}@example.com',)).lastrowid
+    subject_id = conn.execute("INSERT INTO subjects (name) VALUES (?)", (f'{name} Maths',)).lastrowid
+    class_id = conn.execute("INSERT INTO classes (name, teacher_id, subject_id) VALUES (?, ?, ?)",
+                            (name, teacher_id, subject_id)).lastrowid
+    conn.commit()
+    return class_id, teacher_id, subject_id
+
+
+def query_plan(conn, sql):
+    return ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql))
+
+
+def plan_for(conn, statements, marker):
+    """The query plan of the last logged statement containing marker."""
+    matches = [sql for sql in statements if marker in sql and not sql.lstrip().upper().startswith('EXPLAIN')]
+    assert matches, f'no statement containing {marker!r} was run'
+    return query_plan(conn, matches[-1])
@@ -0,0 +1,55 @@
+"""The announcements feed: keyset pages and incremental ?since polls."""
+from .helpers import plan_for
+
+
+def add_announcements(db, count, created_at='2025-01-15 08:00:00'):
+    ids = [db.execute("INSERT INTO announcements (title, content, user_id, created_at) VALUES (?, 'Body', 1, ?)",
+                      (f'Notice {n}', created_at)).lastrowid for n in range(count)]
+    db.commit()
+    return ids
+
+
+def walk(client, headers, **params):
+    ids, cursor = [], None
+    while True:
+        query = {**params, **({'after': cursor} if cursor else {})}
+        page = client.get('/api/announcements', headers=headers, query_string=query).get_json()
+        assert 'total_items' not in page
+        ids += [row['id'] for row in page['data']]
+        cursor = page['next_cursor']
+        if not cursor:
+            return ids
+
+
+def test_cursor_walk_returns_the_feed_newest_first(client, auth_headers, db):
+    older = add_announcements(db, 5, '2025-01-10 08:00:00')
+    newer = add_announcements(db, 7, '2025-01-20 08:00:00')
+    assert walk(client, auth_headers, limit=3) == newer[::-1] + older[::-1]
+
+
+def test_since_id_poll_follows_next_cursor_to_every_new_item(client, auth_headers, db):
+    seen = add_announcements(db, 3)
+    posted = add_announcements(db, 25)
+    assert walk(client, auth_headers, since=seen[-1], limit=10) == posted[::-1]
+    assert walk(client, auth_headers, since=posted[-1], limit=10) == []
+
+
+def test_since_timestamp_poll_returns_only_newer_items(client, auth_headers, db):
+    add_announcements(db, 4, '2025-01-10 08:00:00')
+    newer = add_announcements(db, 2, '2025-01-20 08:00:00')
+    assert walk(client, auth_headers, since='2025-01-15T00:00:00Z', limit=10) == newer[::-1]
+
+
+def test_since_id_poll_seeks_on_rowid(client, auth_headers, db, sql_log):
+    response = client.get('/api/announcements', headers=auth_headers, query_string={'since': 5, 'limit': 10})
+    assert response.status_code == 200
+    plan = plan_for(db, sql_log, 'FROM announcements a')
+    assert 'SEARCH a USING INTEGER PRIMARY KEY (rowid>?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_since_timestamp_poll_uses_created_index(client, auth_headers, db, sql_log):
+    response = client.get('/api/announcements', headers=auth_headers,
+                          query_string={'since': '2025-01-01T00:00:00Z', 'limit': 10})
+    assert response.status_code == 200
+    assert 'SEARCH a USING INDEX idx_announcements_created (created_at>?)' in plan_for(db, sql_log, 'FROM announcements a')
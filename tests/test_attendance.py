@@ -0,0 +1,140 @@
+"""Bulk attendance saves and the pivoted attendance export."""
+import csv
+import io
+
+from openpyxl import load_workbook
+
+from .helpers import add_class, add_students
+
+
+def seed_two_classes(db):
+    first, _, _ = add_class(db, 'Class A')
+    second, _, _ = add_class(db, 'Class B')
+    return first, add_students(db, 3, class_id=first), second, add_students(db, 3, class_id=second, prefix='Other')
+
+
+def bulk_body(first, first_students, second, second_students, status='present'):
+    return {'groups': [
+        {'class_id': first, 'date': '2025-02-03', 'records': [{'student_id': s, 'status': status} for s in first_students]},
+        {'class_id': second, 'date': '2025-02-03', 'records': [{'student_id': s, 'status': status} for s in second_students]},
+    ]}
+
+
+def attendance_rows(db):
+    return db.execute("SELECT student_id, class_id, attendance_date, status FROM attendance ORDER BY id").fetchall()
+
+
+def test_bulk_save_writes_every_group(client, auth_headers, db):
+    first, first_students, second, second_students = seed_two_classes(db)
+    response = client.post('/api/attendance/bulk', headers=auth_headers,
+                           json=bulk_body(first, first_students, second, second_students))
+    assert response.status_code == 200
+    assert response.get_json()['total_saved'] == 6
+    assert len(attendance_rows(db)) == 6
+
+
+def test_one_invalid_record_rejects_the_whole_batch(client, auth_headers, db):
+    first, first_students, second, second_students = seed_two_classes(db)
+    body = bulk_body(first, first_students, second, second_students)
+    body['groups'][1]['records'][2]['status'] = 'sleeping'
+    response = client.post('/api/attendance/bulk', headers=auth_headers, json=body)
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['group'] == 1
+    assert attendance_rows(db) == []
+
+
+def test_student_not_enrolled_rejects_the_whole_batch(client, auth_headers, db):
+    first, first_students, second, second_students = seed_two_classes(db)
+    # The last student of class A marked in class B, where they are not enrolled.
+    response = client.post('/api/attendance/bulk', headers=auth_headers,
+                           json=bulk_body(first, first_students, second, second_students + first_students[-1:]))
+    assert response.status_code == 422
+    assert response.get_json()['not_enrolled'] == [{'student_id': first_students[-1], 'class_id': second}]
+    assert attendance_rows(db) == []
+
+
+def test_write_failure_mid_batch_rolls_back_earlier_rows(client, auth_headers, db):
+    first, first_students, second, second_students = seed_two_classes(db)
+    client.post('/api/attendance/bulk', headers=auth_headers,
+                json=bulk_body(first, first_students, second, second_students, status='absent'))
+    before = attendance_rows(db)
+    # Fail the very last upsert, after every other row in the batch has been written.
+    db.execute(f"""CREATE TRIGGER fail_last_row BEFORE UPDATE ON attendance
+        WHEN new.student_id = {second_students[-1]} BEGIN SELECT RAISE(ABORT, 'disk on fire'); END""")
+    db.commit()
+    response = client.post('/api/attendance/bulk', headers=auth_headers,
+                           json=bulk_body(first, first_students, second, second_students, status='present'))
+    assert response.status_code == 500
+    assert attendance_rows(db) == before
+    assert {row['status'] for row in attendance_rows(db)} == {'absent'}
+
+
+def seed_january(db):
+    """Two classes; marks for 2 and 3 January in Class A and 2 January in Class B."""
+    first, first_students, second, second_students = seed_two_classes(db)
+    db.executemany("INSERT INTO attendance (student_id, class_id, attendance_date, status) VALUES (?, ?, ?, ?)", [
+        (first_students[0], first, '2025-01-02', 'present'),
+        (first_students[0], first, '2025-01-03', 'late'),
+        (first_students[1], first, '2025-01-02', 'absent'),
+        (second_students[0], second, '2025-01-02', 'present'),
+        # Outside the exported month, so neither a column nor part of the totals.
+        (first_students[0], first, '2025-02-01', 'absent'),
+    ])
+    db.commit()
+    return first, first_students, second, second_students
+
+
+def csv_rows(response):
+    return list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip('\ufeff'))))
+
+
+def test_csv_export_pivots_days_into_columns(client, auth_headers, db):
+    first, first_students, _, _ = seed_january(db)
+    response = client.get('/api/attendance/report/export', headers=auth_headers,
+                          query_string={'class_id': first, 'month': '2025-01', 'format': 'csv', 'lang': 'en'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attendance_report_1_2025-01.csv' in response.headers['Content-Disposition']
+    header, *rows = csv_rows(response)
+    assert header == ['Class', 'Student ID', 'Student Name', *map(str, range(1, 32)), 'Present', 'Absent', 'Late']
+    by_student = {int(row[1]): row for row in rows}
+    assert set(by_student) == set(first_students)
+    marked = by_student[first_students[0]]
+    assert marked[3:6] == ['', 'P', 'L']
+    assert marked[-3:] == ['1', '0', '1']
+    assert by_student[first_students[1]][3:5] == ['', 'A']
+    assert by_student[first_students[1]][-3:] == ['0', '1', '0']
+    assert by_student[first_students[2]][3:-3] == [''] * 31
+    assert by_student[first_students[2]][-3:] == ['0', '0', '0']
+
+
+def test_csv_export_of_a_date_range_uses_iso_day_columns(client, auth_headers, db):
+    seed_january(db)
+    response = client.get('/api/attendance/report/export', headers=auth_headers, query_string={
+        'from': '2025-01-02', 'to': '2025-01-04', 'format': 'csv', 'lang': 'en'})
+    header, *rows = csv_rows(response)
+    assert header[3:6] == ['2025-01-02', '2025-01-03', '2025-01-04']
+    # Without class_id every class is exported, ordered by class then student name.
+    assert [row[0] for row in rows] == ['Class A'] * 3 + ['Class B'] * 3
+    assert sum(int(row[-3]) for row in rows) == 2
+
+
+def test_xlsx_export_matches_the_grid(client, auth_headers, db):
+    first, first_students, _, _ = seed_january(db)
+    response = client.get('/api/attendance/report/export', headers=auth_headers,
+                          query_string={'class_id': first, 'month': '2025-01', 'lang': 'en'})
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.data), read_only=True)['Attendance']
+    header, *rows = list(sheet.iter_rows(values_only=True))
+    assert header[:3] == ('Class', 'Student ID', 'Student Name')
+    assert header[-3:] == ('Present', 'Absent', 'Late')
+    assert len(header) == 3 + 31 + 3
+    marked = next(row for row in rows if row[1] == first_students[0])
+    assert marked[4:6] == ('P', 'L')
+    assert marked[-3:] == (1, 0, 1)
+
+
+def test_export_rejects_unknown_format(client, auth_headers):
+    response = client.get('/api/attendance/report/export', headers=auth_headers,
+                          query_string={'month': '2025-01', 'format': 'pdf'})
+    assert response.status_code == 400
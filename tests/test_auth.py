@@ -0,0 +1,64 @@
+"""Login tokens and the teacher_id claim that teacher-scoped endpoints filter on."""
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+import app as ems
+
+from .helpers import add_class
+
+TEACHER_LOOKUP = 'JOIN teachers t ON t.email = u.email'
+
+
+def add_teacher_user(db, email, username='teacher'):
+    password = ems.bcrypt.generate_password_hash('secret').decode('utf-8')
+    user_id = db.execute("INSERT INTO users (username, password, email, full_name, role) VALUES (?, ?, ?, 'Teacher', 'teacher')",
+                         (username, password, email)).lastrowid
+    db.commit()
+    return user_id
+
+
+def login(client, username):
+    response = client.post('/api/login', json={'username': username, 'password': 'secret'})
+    assert response.status_code == 200
+    return response.get_json()['token']
+
+
+def class_names(client, token):
+    response = client.get('/api/classes', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    return [row['name'] for row in response.get_json()['data']]
+
+
+def test_teacher_token_carries_teacher_id_and_classes_filter_on_it(client, db, sql_log):
+    add_class(db, 'Class A')
+    _, teacher_id, _ = add_class(db, 'Class B')
+    add_teacher_user(db, 'class.b@example.com')
+    token = login(client, 'teacher')
+    assert jwt.decode(token, options={'verify_signature': False})['teacher_id'] == teacher_id
+
+    sql_log.clear()
+    assert class_names(client, token) == ['Class B']
+    assert not any(TEACHER_LOOKUP in statement for statement in sql_log)
+
+
+def test_unmatched_teacher_gets_no_claim_and_is_resolved_once_added(client, db):
+    add_teacher_user(db, 'new@example.com')
+    token = login(client, 'teacher')
+    assert 'teacher_id' not in jwt.decode(token, options={'verify_signature': False})
+    assert class_names(client, token) == []
+
+    # The teacher record is created after login; the same token finds it.
+    teacher_id = db.execute("INSERT INTO teachers (name, email, contact) VALUES ('New', 'new@example.com', '012')").lastrowid
+    db.execute("INSERT INTO classes (name, teacher_id) VALUES ('Class N', ?)", (teacher_id,))
+    db.commit()
+    assert class_names(client, token) == ['Class N']
+
+
+def test_null_teacher_id_claim_falls_back_to_lookup(client, db):
+    _, teacher_id, _ = add_class(db, 'Class A')
+    user_id = add_teacher_user(db, 'class.a@example.com')
+    # Tokens issued before the claim was omitted carry teacher_id: null.
+    token = ems.issue_token({'id': user_id, 'username': 'teacher', 'role': 'teacher', 'teacher_id': None,
+                             'exp': datetime.now(timezone.utc) + timedelta(hours=1)})
+    assert class_names(client, token) == ['Class A']
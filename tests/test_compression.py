@@ -0,0 +1,99 @@
+"""Gzip compression of large API responses and the ?format=columnar shape."""
+import gzip
+import json
+
+from .helpers import add_class, add_students
+
+
+def test_weakened_etag_from_gzip_still_revalidates(client, auth_headers, db):
+    db.executemany("INSERT INTO subjects (name, description) VALUES (?, ?)",
+                   [(f'Subject {n}', 'x' * 100) for n in range(30)])
+    db.commit()
+    gzip_headers = {**auth_headers, 'Accept-Encoding': 'gzip'}
+    first = client.get('/api/subjects', headers=gzip_headers)
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'].startswith('W/')
+    assert client.get('/api/subjects', headers={**gzip_headers, 'If-None-Match': first.headers['ETag']}).status_code == 304
+
+
+def seed_report(db):
+    class_id, _, subject_id = add_class(db)
+    student_ids = add_students(db, 40, class_id=class_id)
+    db.executemany(
+        "INSERT INTO attendance (student_id, class_id, attendance_date, status) VALUES (?, ?, ?, ?)",
+        [(student_id, class_id, f'2025-01-{day:02d}', ('present', 'absent', 'late')[(student_id + day) % 3])
+         for student_id in student_ids for day in range(1, 11)])
+    db.executemany(
+        "INSERT INTO grades (student_id, class_id, subject_id, exam_type, score, grade_date) VALUES (?, ?, ?, 'Monthly', ?, '2025-01-15')",
+        [(student_id, class_id, subject_id, 40 + n) for n, student_id in enumerate(student_ids)])
+    db.commit()
+    return class_id
+
+
+def test_gzip_round_trip_matches_plain_body(client, auth_headers, db):
+    class_id = seed_report(db)
+    query = {'class_id': class_id, 'month': '2025-01'}
+    plain = client.get('/api/attendance/report', headers=auth_headers, query_string=query)
+    compressed = client.get('/api/attendance/report', headers={**auth_headers, 'Accept-Encoding': 'gzip'},
+                            query_string=query)
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert len(compressed.data) < len(plain.data)
+    assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+
+
+def test_small_responses_are_not_compressed(client, auth_headers):
+    response = client.get('/api/subjects', headers={**auth_headers, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def rows_from_columnar(table):
+    return [dict(zip(table['columns'], row)) for row in table['rows']]
+
+
+def test_columnar_attendance_report_round_trips(client, auth_headers, db):
+    class_id = seed_report(db)
+    query = {'class_id': class_id, 'month': '2025-01'}
+    objects = client.get('/api/attendance/report', headers=auth_headers, query_string=query).get_json()
+    columnar = client.get('/api/attendance/report', headers={**auth_headers, 'Accept-Encoding': 'gzip'},
+                          query_string={**query, 'format': 'columnar'})
+    body = json.loads(gzip.decompress(columnar.data))
+
+    assert body['report_data']['columns'] == ['student_id', 'student_name', 'attendance', 'present', 'absent', 'late']
+    assert [
+        {'student_id': row['student_id'], 'student_name': row['student_name'], 'attendance': row['attendance'],
+         'totals': {status: row[status] for status in ('present', 'absent', 'late')}}
+        for row in rows_from_columnar(body['report_data'])
+    ] == objects['report_data']
+    assert rows_from_columnar(body['daily_totals']) == objects['daily_totals']
+    assert body['period'] == objects['period']
+
+
+def test_columnar_class_report_round_trips(client, auth_headers, db):
+    class_id = seed_report(db)
+    query = {'class_id': class_id, 'exam_type': 'Monthly'}
+    objects = client.get('/api/results/class-report', headers=auth_headers, query_string=query).get_json()
+    body = client.get('/api/results/class-report', headers=auth_headers,
+                      query_string={**query, 'format': 'columnar'}).get_json()
+
+    students = rows_from_columnar(body['student_results'])
+    assert body['class_info'] == objects['class_info']
+    assert len(students) == len(objects['student_results']) == 40
+    by_id = {row['student_id']: row for row in students}
+    for expected in objects['student_results']:
+        row = by_id[expected['student_id']]
+        assert row['rank'] == expected['rank']
+        assert row['total_score'] == expected['total_score']
+
+
+def test_columnar_class_grades_round_trip(client, auth_headers, db):
+    class_id = seed_report(db)
+    subject_id = db.execute("SELECT subject_id FROM classes WHERE id = ?", (class_id,)).fetchone()[0]
+    query = {'class_id': class_id, 'subject_id': subject_id, 'exam_type': 'Monthly', 'grade_date': '2025-01-15'}
+    objects = client.get('/api/grades/class-view', headers=auth_headers, query_string=query).get_json()
+    body = client.get('/api/grades/class-view', headers=auth_headers,
+                      query_string={**query, 'format': 'columnar'}).get_json()
+    assert body['columns'] == ['student_id', 'student_name_km', 'student_name_en', 'student_name_jp', 'score']
+    assert rows_from_columnar(body) == objects
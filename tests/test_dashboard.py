@@ -0,0 +1,52 @@
+"""The version-keyed /api/dashboard/summary cache."""
+from .helpers import add_class, add_students
+
+
+def get_summary(client, auth_headers):
+    response = client.get('/api/dashboard/summary', headers=auth_headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def rebuilt(sql_log):
+    return any('FROM classes c' in statement for statement in sql_log)
+
+
+def test_summary_is_served_from_cache_until_a_tracked_table_changes(client, auth_headers, db, sql_log):
+    class_id, _, _ = add_class(db)
+    add_students(db, 2, class_id=class_id)
+    first = get_summary(client, auth_headers)
+    assert first['stats']['students'] == 2
+
+    sql_log.clear()
+    assert get_summary(client, auth_headers) == first
+    assert not rebuilt(sql_log)
+
+    # A write through the API bumps the announcements counter.
+    response = client.post('/api/announcements', headers=auth_headers, json={'title': 'Exams', 'content': 'Monday'})
+    assert response.status_code == 201
+    sql_log.clear()
+    summary = get_summary(client, auth_headers)
+    assert rebuilt(sql_log)
+    assert [row['title'] for row in summary['announcements']] == ['Exams']
+
+    # So does one from outside the request cycle, as another worker or a CLI command would make.
+    add_students(db, 1, class_id=class_id)
+    summary = get_summary(client, auth_headers)
+    assert summary['stats']['students'] == 3
+    assert summary['class_sizes'] == [{'class_name': 'Class A', 'student_count': 3}]
+
+
+def test_writes_to_untracked_tables_keep_the_cache(client, auth_headers, db, sql_log):
+    class_id, _, subject_id = add_class(db)
+    student_id, = add_students(db, 1, class_id=class_id)
+    get_summary(client, auth_headers)
+
+    db.execute("""
+        INSERT INTO grades (student_id, class_id, subject_id, exam_type, score, grade_date)
+        VALUES (?, ?, ?, 'Monthly', 80, '2025-01-15')
+    """, (student_id, class_id, subject_id))
+    db.commit()
+    sql_log.clear()
+    get_summary(client, auth_headers)
+    assert not rebuilt(sql_log)
@@ -0,0 +1,47 @@
+"""Conditional GETs with ETags derived from the table_versions counters."""
+
+
+def test_etag_revalidates_with_304_until_a_write(client, auth_headers, db):
+    db.execute("INSERT INTO subjects (name) VALUES ('Khmer')")
+    db.commit()
+    first = client.get('/api/subjects', headers=auth_headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    revalidated = client.get('/api/subjects', headers={**auth_headers, 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+
+    db.execute("INSERT INTO subjects (name) VALUES ('English')")
+    db.commit()
+    changed = client.get('/api/subjects', headers={**auth_headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['total_items'] == 2
+
+
+def test_304_answers_without_querying_the_data(client, auth_headers, sql_log):
+    etag = client.get('/api/subjects', headers=auth_headers).headers['ETag']
+    sql_log.clear()
+    assert client.get('/api/subjects', headers={**auth_headers, 'If-None-Match': etag}).status_code == 304
+    assert sql_log
+    assert all('table_versions' in statement for statement in sql_log)
+
+
+def test_etag_depends_on_the_query_string(client, auth_headers):
+    first = client.get('/api/subjects', headers=auth_headers, query_string={'page': 1})
+    second = client.get('/api/subjects', headers=auth_headers, query_string={'page': 2})
+    assert first.headers['ETag'] != second.headers['ETag']
+    response = client.get('/api/subjects', headers={**auth_headers, 'If-None-Match': first.headers['ETag']},
+                          query_string={'page': 2})
+    assert response.status_code == 200
+
+
+def test_api_writes_change_the_etag(client, auth_headers):
+    etag = client.get('/api/subjects', headers=auth_headers).headers['ETag']
+    assert client.post('/api/subjects', headers=auth_headers, json={'name': 'Science'}).status_code == 201
+    response = client.get('/api/subjects', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [subject['name'] for subject in response.get_json()['data']] == ['Science']
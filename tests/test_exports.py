@@ -0,0 +1,33 @@
+"""Downloading finished background export jobs."""
+import os
+
+import app as ems
+
+
+def add_export_job(db, job_id, expires_in_seconds):
+    file_path = os.path.join(ems.app.config['EXPORT_FOLDER'], f'{job_id}.pdf')
+    with open(file_path, 'wb') as f:
+        f.write(b'%PDF-1.7 test')
+    db.execute("""
+        INSERT INTO export_jobs (id, kind, params, status, user_id, file_path, download_name, finished_at, expires_at)
+        VALUES (?, 'students_pdf', '{}', 'done', 1, ?, 'students.pdf', CURRENT_TIMESTAMP, datetime('now', ?))
+    """, (job_id, file_path, f'{expires_in_seconds:+d} seconds'))
+    db.commit()
+    return file_path
+
+
+def test_finished_export_downloads(client, auth_headers, db):
+    add_export_job(db, 'fresh', 3600)
+    response = client.get('/api/exports/fresh/download', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.data == b'%PDF-1.7 test'
+    assert 'students.pdf' in response.headers['Content-Disposition']
+
+
+def test_expired_export_is_gone_and_deleted(client, auth_headers, db):
+    file_path = add_export_job(db, 'stale', -60)
+    response = client.get('/api/exports/stale/download', headers=auth_headers)
+    assert response.status_code == 410
+    assert not os.path.exists(file_path)
+    assert db.execute("SELECT COUNT(*) FROM export_jobs WHERE id = 'stale'").fetchone()[0] == 0
+    assert client.get('/api/exports/stale/download', headers=auth_headers).status_code == 404
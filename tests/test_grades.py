@@ -0,0 +1,93 @@
+"""grade_aggregates maintenance and the ranks built on it."""
+from .helpers import add_class, add_students
+
+GRADE_UPSERT = """
+    INSERT INTO grades (student_id, class_id, subject_id, exam_type, score, grade_date) VALUES (?, ?, ?, ?, ?, '2025-01-15')
+    ON CONFLICT(student_id, class_id, subject_id, exam_type, grade_date) DO UPDATE SET score = excluded.score
+"""
+
+
+def add_subject(db, name):
+    subject_id = db.execute("INSERT INTO subjects (name) VALUES (?)", (name,)).lastrowid
+    db.commit()
+    return subject_id
+
+
+def aggregates(db):
+    return {(row['class_id'], row['exam_type'], row['student_id']): (row['sum_score'], row['grade_count'], row['scored_count'])
+            for row in db.execute("SELECT * FROM grade_aggregates")}
+
+
+def recomputed(db):
+    return {(row[0], row[1], row[2]): (row[3], row[4], row[5]) for row in db.execute("""
+        SELECT class_id, exam_type, student_id, TOTAL(score), COUNT(*), COUNT(score)
+        FROM grades GROUP BY class_id, exam_type, student_id""")}
+
+
+def test_triggers_keep_aggregates_equal_to_grades(db):
+    class_id, _, maths = add_class(db)
+    other_class, _, _ = add_class(db, 'Class B')
+    science = add_subject(db, 'Science')
+    first, second = add_students(db, 2, class_id=class_id)
+
+    db.executemany(GRADE_UPSERT, [(first, class_id, maths, 'Monthly', 80), (first, class_id, science, 'Monthly', None),
+                                  (second, class_id, maths, 'Monthly', 40), (second, class_id, science, 'Final', 70)])
+    assert aggregates(db) == recomputed(db)
+    assert aggregates(db)[(class_id, 'Monthly', first)] == (80, 2, 1)
+
+    db.execute("UPDATE grades SET score = 60 WHERE student_id = ? AND subject_id = ?", (first, science))
+    assert aggregates(db)[(class_id, 'Monthly', first)] == (140, 2, 2)
+
+    # Moving a grade to another exam or class updates both the old and the new row.
+    db.execute("UPDATE grades SET exam_type = 'Final' WHERE student_id = ? AND exam_type = 'Monthly'", (second,))
+    db.execute("UPDATE grades SET class_id = ? WHERE student_id = ? AND subject_id = ?", (other_class, first, science))
+    assert aggregates(db) == recomputed(db)
+    assert (class_id, 'Monthly', second) not in aggregates(db)
+    assert aggregates(db)[(class_id, 'Final', second)] == (110, 2, 2)
+
+    db.execute("DELETE FROM grades WHERE student_id = ? AND class_id = ?", (first, class_id))
+    db.execute("DELETE FROM students WHERE id = ?", (second,))
+    assert aggregates(db) == recomputed(db)
+    assert set(aggregates(db)) == {(other_class, 'Monthly', first)}
+
+
+def test_repeated_edits_do_not_drift(db):
+    class_id, _, maths = add_class(db)
+    science = add_subject(db, 'Science')
+    students = add_students(db, 2, class_id=class_id)
+    # Re-saving the sheet with different scores many times, then settling on the same final grades.
+    for score in (33.3, 66.6, 12.1, 99.9, 45.45, 0.1) * 5:
+        db.executemany(GRADE_UPSERT, [(students[0], class_id, maths, 'Monthly', score),
+                                      (students[0], class_id, science, 'Monthly', 100 - score)])
+    for student_id in students:
+        db.executemany(GRADE_UPSERT, [(student_id, class_id, maths, 'Monthly', 77.7),
+                                      (student_id, class_id, science, 'Monthly', 12.3)])
+    db.commit()
+    sums = [db.execute("SELECT sum_score, average FROM grade_aggregates WHERE student_id = ?", (student_id,)).fetchone()
+            for student_id in students]
+    assert [tuple(row) for row in sums] == [(90.0, 45.0), (90.0, 45.0)]
+
+
+def test_equal_grades_tie_in_class_results_and_report_cards(client, auth_headers, db):
+    class_id, _, maths = add_class(db)
+    science = add_subject(db, 'Science')
+    first, second, third = add_students(db, 3, class_id=class_id)
+    for score in (10, 20, 30, 40, 55.5):
+        db.execute(GRADE_UPSERT, (first, class_id, maths, 'Monthly', score))
+    db.executemany(GRADE_UPSERT, [
+        (first, class_id, maths, 'Monthly', 77.7), (first, class_id, science, 'Monthly', 22.3),
+        (second, class_id, maths, 'Monthly', 77.7), (second, class_id, science, 'Monthly', 22.3),
+        (third, class_id, maths, 'Monthly', 50), (third, class_id, science, 'Monthly', 40),
+    ])
+    db.commit()
+
+    results = client.get('/api/results/class-report', headers=auth_headers,
+                         query_string={'class_id': class_id, 'exam_type': 'Monthly'}).get_json()['student_results']
+    by_student = {row['student_id']: row for row in results}
+    assert (by_student[first]['rank'], by_student[second]['rank'], by_student[third]['rank']) == (1, 1, 3)
+    # An average of exactly 50 passes.
+    assert (by_student[first]['total_score'], by_student[first]['average'], by_student[first]['result']) == (100, 50, 'Pass')
+
+    cards = client.get('/api/results/report-cards', headers=auth_headers,
+                       query_string={'class_id': class_id, 'exam_type': 'Monthly'}).get_json()['report_cards']
+    assert {card['student_id']: card['rank'] for card in cards} == {first: 1, second: 1, third: 3}
@@ -0,0 +1,80 @@
+"""Grade sheet and student roster imports, including files that cannot be read."""
+import io
+
+from .helpers import add_class, add_students
+
+
+def upload(data, filename):
+    return (io.BytesIO(data), filename)
+
+
+def grade_form(class_id, subject_id, file):
+    return {'class_id': class_id, 'subject_id': subject_id, 'exam_type': 'Monthly', 'grade_date': '2025-01-15', 'file': file}
+
+
+def test_grade_sheet_csv_import(client, auth_headers, db):
+    class_id, _, subject_id = add_class(db)
+    first, second = add_students(db, 2, class_id=class_id)
+    sheet = f'ID,Score\n{first},88.5\n{second},not-a-score\n'.encode('utf-8')
+    response = client.post('/api/grades/import', headers=auth_headers,
+                           data=grade_form(class_id, subject_id, upload(sheet, 'grades.csv')))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['imported'] == 1
+    assert body['errors'] == [{'row': 3, 'message': 'Invalid score: not-a-score'}]
+    assert db.execute("SELECT score FROM grades WHERE student_id = ?", (first,)).fetchone()['score'] == 88.5
+
+
+def test_corrupt_grade_workbook_is_rejected(client, auth_headers, db):
+    class_id, _, subject_id = add_class(db)
+    for data in (b'this is not a zip archive', b'PK\x03\x04 truncated'):
+        response = client.post('/api/grades/import', headers=auth_headers,
+                               data=grade_form(class_id, subject_id, upload(data, 'grades.xlsx')))
+        assert response.status_code == 400
+        assert 'not a valid .xlsx' in response.get_json()['message']
+
+
+def test_grade_sheet_csv_in_wrong_encoding_is_rejected(client, auth_headers, db):
+    class_id, _, subject_id = add_class(db)
+    sheet = 'ឈ្មោះ,ពិន្ទុ\nសុខ,90\n'.encode('utf-16')
+    response = client.post('/api/grades/import', headers=auth_headers,
+                           data=grade_form(class_id, subject_id, upload(sheet, 'grades.csv')))
+    assert response.status_code == 400
+    assert 'UTF-8' in response.get_json()['message']
+
+
+def roster_csv(*rows):
+    return ('Name (Khmer),Date of Birth,Contact\n' + ''.join(f'{row}\n' for row in rows)).encode('utf-8')
+
+
+def test_student_roster_import(client, auth_headers, db):
+    response = client.post('/api/students/import', headers=auth_headers, data={
+        'roster': upload(roster_csv('សុខ,2010-01-01,012', 'ចាន់,,012'), 'roster.csv')})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['processed'], body['inserted']) == (2, 1)
+    assert body['errors'] == [{'row': 3, 'message': 'Missing required fields: dob'}]
+
+
+def test_corrupt_roster_workbook_is_rejected(client, auth_headers, db):
+    response = client.post('/api/students/import', headers=auth_headers, data={
+        'roster': upload(b'this is not a zip archive', 'roster.xlsx')})
+    assert response.status_code == 400
+    assert 'not a valid .xlsx' in response.get_json()['message']
+    assert db.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 0
+
+
+def test_roster_csv_in_wrong_encoding_is_rejected(client, auth_headers):
+    response = client.post('/api/students/import', headers=auth_headers, data={
+        'roster': upload(roster_csv('សុខ,2010-01-01,012').decode('utf-8').encode('utf-16'), 'roster.csv')})
+    assert response.status_code == 400
+    assert 'UTF-8' in response.get_json()['message']
+
+
+def test_streamed_import_of_corrupt_roster_ends_with_a_message(client, auth_headers):
+    response = client.post('/api/students/import', headers=auth_headers, data={
+        'roster': upload(b'this is not a zip archive', 'roster.xlsx'), 'stream': '1'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1
+    assert '"done": true' in lines[0] and 'not a valid .xlsx' in lines[0]
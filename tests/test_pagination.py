@@ -0,0 +1,38 @@
+from .helpers import add_students
+
+
+def walk_cursor(client, headers, **params):
+    """Follows next_cursor from the first cursor page to the end; returns every id seen."""
+    ids = []
+    query = {**params, 'after': ''}
+    while True:
+        response = client.get('/api/students', headers=headers, query_string=query)
+        assert response.status_code == 200
+        body = response.get_json()
+        ids += [row['id'] for row in body['data']]
+        if body['next_cursor'] is None:
+            return ids
+        query['after'] = body['next_cursor']
+
+
+def test_cursor_walk_returns_every_student_once(client, auth_headers, db):
+    student_ids = add_students(db, 23)
+    ids = walk_cursor(client, auth_headers, limit=5)
+    assert ids == sorted(student_ids, reverse=True)
+
+
+def test_cursor_and_page_modes_agree(client, auth_headers, db):
+    add_students(db, 12)
+    page = client.get('/api/students', headers=auth_headers, query_string={'limit': 5, 'page': 2}).get_json()
+    first = client.get('/api/students', headers=auth_headers, query_string={'limit': 5, 'after': ''}).get_json()
+    second = client.get('/api/students', headers=auth_headers,
+                        query_string={'limit': 5, 'after': first['next_cursor']}).get_json()
+    assert [row['id'] for row in second['data']] == [row['id'] for row in page['data']]
+    assert page['total_items'] == 12
+    assert second['total_items'] is None
+
+
+def test_invalid_cursor_is_rejected(client, auth_headers, db):
+    add_students(db, 3)
+    response = client.get('/api/students', headers=auth_headers, query_string={'after': 'not-a-cursor'})
+    assert response.status_code == 400
@@ -0,0 +1,60 @@
+"""The hot read paths must be served by their indexes, not table scans."""
+from .helpers import add_class, add_students, plan_for
+
+
+def seed_class(db):
+    class_id, teacher_id, subject_id = add_class(db)
+    student_ids = add_students(db, 5, class_id=class_id)
+    db.executemany(
+        "INSERT INTO grades (student_id, class_id, subject_id, exam_type, score, grade_date) VALUES (?, ?, ?, 'Monthly', ?, '2025-01-15')",
+        [(student_id, class_id, subject_id, 60 + n) for n, student_id in enumerate(student_ids)])
+    db.executemany(
+        "INSERT INTO attendance (student_id, class_id, attendance_date, status) VALUES (?, ?, '2025-01-15', 'present')",
+        [(student_id, class_id) for student_id in student_ids])
+    db.execute("INSERT INTO timetables (class_id, teacher_id, subject_id, day_of_week, start_time, end_time) VALUES (?, ?, ?, 1, '08:00', '09:00')",
+               (class_id, teacher_id, subject_id))
+    db.commit()
+    return class_id, subject_id
+
+
+def test_enrolled_students_use_enrollment_index(client, auth_headers, db, sql_log):
+    class_id, _ = seed_class(db)
+    assert client.get(f'/api/classes/{class_id}/students', headers=auth_headers).status_code == 200
+    assert 'idx_enrollments_class' in plan_for(db, sql_log, 'JOIN enrollments e ON s.id = e.student_id')
+
+
+def test_grade_sheet_probes_grades_by_index(client, auth_headers, db, sql_log):
+    class_id, subject_id = seed_class(db)
+    response = client.get('/api/grades/class-view', headers=auth_headers, query_string={
+        'class_id': class_id, 'subject_id': subject_id, 'exam_type': 'Monthly', 'grade_date': '2025-01-15'})
+    assert response.status_code == 200
+    plan = plan_for(db, sql_log, 'LEFT JOIN grades g')
+    assert 'idx_enrollments_class' in plan
+    # One probe per student on an index of the grading context (the UNIQUE key or idx_grades_class_exam).
+    assert 'SEARCH g USING' in plan
+    assert 'SCAN g' not in plan
+
+
+def test_class_results_use_grade_and_attendance_indexes(client, auth_headers, db, sql_log):
+    class_id, _ = seed_class(db)
+    response = client.get('/api/results/class-report', headers=auth_headers,
+                          query_string={'class_id': class_id, 'exam_type': 'Monthly'})
+    assert response.status_code == 200
+    assert 'idx_grades_class_exam' in plan_for(db, sql_log, 'WHERE g.class_id =')
+    assert 'COVERING INDEX idx_attendance_class_student' in plan_for(db, sql_log, 'GROUP BY student_id, status')
+
+
+def test_class_timetable_uses_timetable_index(client, auth_headers, db, sql_log):
+    class_id, _ = seed_class(db)
+    assert client.get(f'/api/timetables/class/{class_id}', headers=auth_headers).status_code == 200
+    plan = plan_for(db, sql_log, 'FROM timetables tt')
+    assert 'idx_timetables_class' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_attendance_report_uses_class_date_index(client, auth_headers, db, sql_log):
+    class_id, _ = seed_class(db)
+    response = client.get('/api/attendance/report', headers=auth_headers,
+                          query_string={'class_id': class_id, 'month': '2025-01'})
+    assert response.status_code == 200
+    assert 'idx_attendance_class_date' in plan_for(db, sql_log, 'GROUP BY attendance_date')
@@ -0,0 +1,46 @@
+"""Merging rendered roster chunks into one PDF."""
+import io
+
+from PIL import Image
+from pypdf import PdfReader
+
+import reports
+
+
+def write_chunk(path, colours):
+    """A PDF with one solid-colour image page per colour."""
+    pages = [Image.new('RGB', (60, 80), colour) for colour in colours]
+    pages[0].save(path, save_all=True, append_images=pages[1:])
+    return str(path)
+
+
+def page_colours(pdf_bytes):
+    # Pillow stores RGB pages as JPEG, so channels come back within a few levels.
+    reader = PdfReader(io.BytesIO(pdf_bytes), strict=True)
+    return [tuple(round(channel / 5) * 5 for channel in page.images[0].image.getpixel((30, 40)))
+            for page in reader.pages]
+
+
+def test_merge_keeps_every_page_in_order(tmp_path):
+    chunks = [
+        write_chunk(tmp_path / '0.pdf', [(255, 0, 0), (0, 255, 0)]),
+        write_chunk(tmp_path / '1.pdf', [(0, 0, 255)]),
+        write_chunk(tmp_path / '2.pdf', [(255, 255, 0), (0, 255, 255), (255, 0, 255)]),
+    ]
+    target = io.BytesIO()
+    reports.merge_pdfs(chunks, target)
+    assert page_colours(target.getvalue()) == [
+        (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255)]
+
+
+def test_merge_writes_to_a_path(tmp_path):
+    chunks = [write_chunk(tmp_path / f'{n}.pdf', [(n * 100, 0, 0)]) for n in range(2)]
+    reports.merge_pdfs(chunks, str(tmp_path / 'merged.pdf'))
+    assert page_colours((tmp_path / 'merged.pdf').read_bytes()) == [(0, 0, 0), (100, 0, 0)]
+
+
+def test_single_chunk_is_copied_as_is(tmp_path):
+    chunk = write_chunk(tmp_path / '0.pdf', [(10, 20, 30)])
+    target = io.BytesIO()
+    reports.merge_pdfs([chunk], target)
+    assert target.getvalue() == (tmp_path / '0.pdf').read_bytes()
@@ -0,0 +1,63 @@
+"""Trigram FTS search on students and teachers, and how relevance-ordered results page."""
+from .helpers import add_students
+
+
+def search_ids(client, headers, path, term, **params):
+    response = client.get(path, headers=headers, query_string={'search': term, **params})
+    assert response.status_code == 200
+    return [row['id'] for row in response.get_json()['data']]
+
+
+def test_trigram_search_matches_khmer_and_japanese_substrings(client, auth_headers, db):
+    khmer = db.execute("INSERT INTO students (name, name_km, name_en, name_jp, dob, contact) VALUES "
+                       "('សុខ ចាន់ថា', 'សុខ ចាន់ថា', 'Sok Chantha', 'ソク・チャンター', '2010-01-01', '012')").lastrowid
+    add_students(db, 5)
+    db.commit()
+    assert search_ids(client, auth_headers, '/api/students', 'ចាន់ថា') == [khmer]
+    assert search_ids(client, auth_headers, '/api/students', 'チャン') == [khmer]
+    assert search_ids(client, auth_headers, '/api/students', 'chant') == [khmer]
+
+
+def test_search_index_follows_updates_and_deletes(client, auth_headers, db):
+    student_id, other_id = add_students(db, 2, prefix='Dara')
+    db.execute("UPDATE students SET name_km = 'Visal', name_en = 'Visal' WHERE id = ?", (student_id,))
+    db.execute("DELETE FROM students WHERE id = ?", (other_id,))
+    db.commit()
+    assert search_ids(client, auth_headers, '/api/students', 'Visal') == [student_id]
+    assert search_ids(client, auth_headers, '/api/students', 'Dara') == []
+
+
+def test_teacher_search_matches_email(client, auth_headers, db):
+    teacher_id = db.execute("INSERT INTO teachers (name, email, contact) VALUES ('Kanha', 'kanha.sok@example.com', '012')").lastrowid
+    db.commit()
+    assert search_ids(client, auth_headers, '/api/teachers', 'kanha.sok') == [teacher_id]
+
+
+def test_short_terms_fall_back_to_like(client, auth_headers, db):
+    student_id = add_students(db, 1, prefix='Bo')[0]
+    assert search_ids(client, auth_headers, '/api/students', 'Bo') == [student_id]
+
+
+def test_rank_ordered_search_pages_without_cursor(client, auth_headers, db):
+    add_students(db, 12, prefix='Sokha')
+    response = client.get('/api/students', headers=auth_headers, query_string={'search': 'Sokha', 'limit': 5})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['total_items'] == 12
+    # An id cursor cannot resume relevance order, so search results page by ?page only.
+    assert body['next_cursor'] is None
+
+    ids = []
+    for page in range(1, body['total_pages'] + 1):
+        ids += [row['id'] for row in client.get('/api/students', headers=auth_headers, query_string={
+            'search': 'Sokha', 'limit': 5, 'page': page}).get_json()['data']]
+    assert len(ids) == len(set(ids)) == 12
+
+
+def test_rank_ordered_search_rejects_cursor(client, auth_headers, db):
+    add_students(db, 12, prefix='Sokha')
+    first = client.get('/api/students', headers=auth_headers, query_string={'limit': 5, 'after': ''}).get_json()
+    response = client.get('/api/students', headers=auth_headers,
+                          query_string={'search': 'Sokha', 'limit': 5, 'after': first['next_cursor']})
+    assert response.status_code == 400
+
@@ -0,0 +1,32 @@
+"""Importing the app must stay cheap: the PDF, image and spreadsheet stacks load on first use."""
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_SECONDS = 2.0
+LAZY_MODULES = ('weasyprint', 'pypdf', 'PIL', 'openpyxl')
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'loaded': [name for name in {LAZY_MODULES!r} if name in sys.modules],
+    'threads': __import__('threading').active_count(),
+}}))
+"""
+
+
+def test_cold_import_stays_within_budget(tmp_path):
+    # A fresh interpreter, so nothing is already imported or cached in-process.
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=REPO_DIR, capture_output=True, text=True,
+                            env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}, timeout=60)
+    assert result.returncode == 0, result.stderr
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    assert probe['loaded'] == []
+    # The report warm-up runs from gunicorn's post_fork hook, not at import.
+    assert probe['threads'] == 1
+    assert probe['seconds'] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,90 @@
+"""flask ems build-assets output and precompressed static serving."""
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+
+import app as ems
+
+
+@pytest.fixture
+def dist(tmp_path, monkeypatch):
+    monkeypatch.setattr(ems, 'STATIC_DIST_FOLDER', str(tmp_path / 'dist'))
+    manifest = ems.build_static_assets()
+    return tmp_path / 'dist', manifest
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_manifest_maps_every_asset_to_a_content_hashed_file(dist):
+    folder, manifest = dist
+    assert 'js/app.js' in manifest and 'style.css' in manifest
+    assert json.loads(read(folder / 'manifest.json')) == manifest
+    for source, hashed in manifest.items():
+        content = read(folder / hashed)
+        stem, ext = os.path.splitext(source)
+        assert hashed == f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+        if len(content) >= ems.STATIC_COMPRESS_MIN_SIZE:
+            assert gzip.decompress(read(folder / f'{hashed}.gz')) == content
+
+
+def test_imports_and_index_point_at_hashed_files(dist):
+    folder, manifest = dist
+    app_js = read(folder / manifest['js/app.js']).decode('utf-8')
+    for target in ems.module_imports('js/app.js', read(os.path.join(ems.BASE_DIR, 'static', 'js', 'app.js')).decode('utf-8')):
+        assert os.path.basename(manifest[target]) in app_js
+
+    index_html = read(folder / 'index.html').decode('utf-8')
+    assert f'src="/static/dist/{manifest["js/app.js"]}"' in index_html
+    assert f'href="/static/dist/{manifest["style.css"]}"' in index_html
+    assert '"/static/js/app.js"' not in index_html
+    assert f'<link rel="modulepreload" href="/static/dist/{manifest["js/api.js"]}">' in index_html
+
+
+def test_hashed_asset_is_negotiated_by_accept_encoding(client, dist):
+    folder, manifest = dist
+    url = f'/static/dist/{manifest["js/app.js"]}'
+    content = read(folder / manifest['js/app.js'])
+
+    plain = client.get(url)
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.data == content
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+    assert plain.headers['Cache-Control'] == ems.IMMUTABLE_CACHE_CONTROL
+    assert plain.mimetype == 'text/javascript'
+
+    gzipped = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['Vary'] == 'Accept-Encoding'
+    assert gzipped.mimetype == 'text/javascript'
+    assert gzip.decompress(gzipped.data) == content
+
+
+@pytest.mark.skipif(ems.brotli is None, reason='brotli is not installed')
+def test_brotli_is_preferred_when_accepted(client, dist):
+    folder, manifest = dist
+    response = client.get(f'/static/dist/{manifest["style.css"]}', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert ems.brotli.decompress(response.data) == read(folder / manifest['style.css'])
+
+
+def test_falls_back_to_the_plain_file_without_a_compressed_variant(client, dist):
+    ems.write_static_asset('tiny.js', b'export const x = 1;\n')
+    response = client.get('/static/dist/tiny.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'export const x = 1;\n'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_built_index_is_always_revalidated(client, dist):
+    folder, _ = dist
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert gzip.decompress(response.data) == read(folder / 'index.html')
@@ -0,0 +1,88 @@
+"""Configurable timetable periods and the (day, period) grid built from them."""
+import app as ems
+
+from .helpers import add_class
+
+PERIODS = [
+    {'id': 1, 'label': None, 'start_time': '07:00', 'end_time': '08:00'},
+    {'id': 2, 'label': None, 'start_time': '08:00', 'end_time': '09:00'},
+    {'id': 3, 'label': 'Late', 'start_time': '10:00', 'end_time': '11:00'},
+]
+
+
+def put_periods(client, auth_headers, periods):
+    return client.put('/api/timetables/periods', headers=auth_headers, json=periods)
+
+
+def entry(day, start_time, end_time, subject='Maths'):
+    return {'day_of_week': day, 'start_time': start_time, 'end_time': end_time, 'subject_name': subject}
+
+
+def test_periods_are_normalized_and_sorted(client, auth_headers):
+    response = put_periods(client, auth_headers, [
+        {'start_time': '10:00', 'end_time': '11:00'},
+        {'start_time': '8:00', 'end_time': '9:00:00', 'label': 'First'},
+        # Periods may touch without overlapping.
+        {'start_time': '09:00', 'end_time': '10:00'},
+    ])
+    assert response.status_code == 200
+    assert [(p['label'], p['start_time'], p['end_time']) for p in response.get_json()] == [
+        ('First', '08:00', '09:00'), (None, '09:00', '10:00'), (None, '10:00', '11:00')]
+
+
+def test_overlapping_periods_are_rejected(client, auth_headers):
+    before = client.get('/api/timetables/periods', headers=auth_headers).get_json()
+    # '8:30' is compared as '08:30'; unpadded it would sort after '10:00' and slip past.
+    response = put_periods(client, auth_headers, [
+        {'start_time': '08:00', 'end_time': '09:00'},
+        {'start_time': '8:30', 'end_time': '09:30'},
+        {'start_time': '10:00', 'end_time': '11:00'},
+    ])
+    assert response.status_code == 400
+    assert 'overlap' in response.get_json()['message']
+    assert client.get('/api/timetables/periods', headers=auth_headers).get_json() == before
+
+
+def test_invalid_periods_are_rejected(client, auth_headers):
+    for periods in ([], [{'start_time': '24:00', 'end_time': '25:00'}], [{'start_time': '09:00', 'end_time': '08:00'}],
+                    [{'start_time': '9', 'end_time': '10'}], ['08:00-09:00']):
+        assert put_periods(client, auth_headers, periods).status_code == 400, periods
+
+
+def test_entry_times_are_stored_zero_padded(client, auth_headers, db):
+    class_id, teacher_id, subject_id = add_class(db)
+    response = client.post('/api/timetables', headers=auth_headers, json={
+        'class_id': class_id, 'teacher_id': teacher_id, 'subject_id': subject_id,
+        'day_of_week': 1, 'start_time': '8:00', 'end_time': '09:00:00'})
+    assert response.status_code == 201
+    assert tuple(db.execute("SELECT start_time, end_time FROM timetables").fetchone()) == ('08:00', '09:00')
+
+    response = client.post('/api/timetables', headers=auth_headers, json={
+        'class_id': class_id, 'teacher_id': teacher_id, 'subject_id': subject_id,
+        'day_of_week': 1, 'start_time': 'noon', 'end_time': '13:00'})
+    assert response.status_code == 400
+
+
+def test_grid_places_entries_in_every_period_they_overlap():
+    double = entry(1, '07:00', '09:00')
+    rows, grid = ems.build_timetable_grid([double], PERIODS)
+    assert [row['key'] for row in rows] == [('07:00', '08:00'), ('08:00', '09:00'), ('10:00', '11:00')]
+    assert grid == {(1, ('07:00', '08:00')): [double], (1, ('08:00', '09:00')): [double]}
+    assert rows[2]['label'] == 'Late'
+
+
+def test_grid_keeps_entries_outside_every_period_in_their_own_row():
+    lunch, evening = entry(2, '09:00', '10:00', 'Club'), entry(3, '17:30', '18:15', 'Sport')
+    rows, grid = ems.build_timetable_grid([evening, lunch], PERIODS)
+    assert [row['key'] for row in rows] == [
+        ('07:00', '08:00'), ('08:00', '09:00'), ('09:00', '10:00'), ('10:00', '11:00'), ('17:30', '18:15')]
+    assert grid[(2, ('09:00', '10:00'))] == [lunch]
+    assert grid[(3, ('17:30', '18:15'))] == [evening]
+    assert rows[2]['label'] == '09:00 - 10:00'
+
+
+def test_grid_matches_unpadded_legacy_entry_times():
+    legacy = entry(1, '8:00', '9:00')
+    rows, grid = ems.build_timetable_grid([legacy], PERIODS)
+    assert len(rows) == len(PERIODS)
+    assert grid == {(1, ('08:00', '09:00')): [legacy]}